@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from foodgram_backend.db_routers import check_replica_pin_cache
+
+        from . import signals  # noqa: F401
+        checks.register(check_replica_pin_cache, checks.Tags.caches)
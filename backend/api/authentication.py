@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from .constants import (AUTH_TOKEN_CACHE_KEY, AUTH_TOKEN_CACHE_MAXSIZE,
+                        AUTH_TOKEN_CACHE_TIMEOUT, AUTH_USER_CACHE_FIELDS)
+
+User = get_user_model()
+# Порядок полей модели: в нём from_db ждёт значения неотложенных полей.
+USER_CACHE_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in AUTH_USER_CACHE_FIELDS
+)
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш ограниченного размера с временем жизни."""
+
+    def __init__(self, maxsize, timeout):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+token_cache = TTLCache(AUTH_TOKEN_CACHE_MAXSIZE, AUTH_TOKEN_CACHE_TIMEOUT)
+
+
+def get_shared_token_cache():
+    alias = settings.AUTH_TOKEN_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def invalidate_tokens(keys):
+    """Удаляет токены из кэша аутентификации."""
+    shared_cache = get_shared_token_cache()
+    for key in keys:
+        token_cache.delete(key)
+        if shared_cache is not None:
+            shared_cache.delete(AUTH_TOKEN_CACHE_KEY.format(key))
+
+
+def get_user_state(user):
+    """Значения полей AUTH_USER_CACHE_FIELDS для хранения в кэше."""
+    return tuple(
+        User._meta.get_field(field).get_prep_value(getattr(user, field))
+        for field in USER_CACHE_FIELDS
+    )
+
+
+def build_user(state):
+    """
+    Пользователь из кэша. Остальные поля, в том числе password,
+    is_active и deleted_at, отложены: полный save() такого объекта
+    записывает только загруженные поля, а отложенные читает из базы
+    при первом обращении.
+    """
+    return User.from_db(
+        router.db_for_write(User), USER_CACHE_FIELDS, state)
+
+
+def get_cached_user_state(key):
+    shared_cache = get_shared_token_cache()
+    if shared_cache is not None:
+        return shared_cache.get(AUTH_TOKEN_CACHE_KEY.format(key))
+    return token_cache.get(key)
+
+
+def set_cached_user_state(key, state):
+    shared_cache = get_shared_token_cache()
+    if shared_cache is not None:
+        shared_cache.set(AUTH_TOKEN_CACHE_KEY.format(key), state,
+                         AUTH_TOKEN_CACHE_TIMEOUT)
+    else:
+        token_cache.set(key, state)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Аутентификация по токену с кэшированием пользователя.
+    Для активного пользователя в локальном кэше процесса, а при
+    заданном AUTH_TOKEN_CACHE_ALIAS - в общем кэше Django, хранятся
+    поля AUTH_USER_CACHE_FIELDS, и запрос аутентифицируется без
+    обращения к базе. Кэш сбрасывается сигналами при выходе и при
+    любом изменении пользователя, включая смену пароля, деактивацию
+    и удаление; в локальном кэше других процессов запись живёт
+    не дольше AUTH_TOKEN_CACHE_TIMEOUT секунд.
+    """
+
+    def authenticate_credentials(self, key):
+        state = get_cached_user_state(key)
+        if state is None:
+            user, token = super().authenticate_credentials(key)
+            if user.deleted_at is not None:
+                raise exceptions.AuthenticationFailed(
+                    _('User inactive or deleted.'))
+            set_cached_user_state(key, get_user_state(user))
+            return user, token
+        user = build_user(state)
+        token = self.get_model()(key=key, user=user)
+        token._state.adding = False
+        return user, token
@@ -0,0 +1,186 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from .constants import RECIPE_FRAGMENT_CACHE_TIMEOUT
+from .utils import get_recipe_fragment_key
+from food.constants import RECIPE_INGREDIENTS_ORDERING, RECIPE_TAGS_ORDERING
+from food.models import Favorite, IngredientRecipe, Recipe, ShoppingCart
+from users.models import Follow
+
+User = get_user_model()
+
+
+class RowBuilder:
+    """
+    Собирает ответ из кортежей values_list без создания моделей
+    и полей DRF. Результат совпадает с ответом сериализатора
+    с теми же полями в том же порядке.
+    """
+    __slots__ = ('keys', 'columns', 'converters')
+
+    def __init__(self, fields, converters=None):
+        self.keys = tuple(key for key, _ in fields)
+        self.columns = tuple(column for _, column in fields)
+        self.converters = tuple((converters or {}).items())
+
+    def __call__(self, row, **converter_kwargs):
+        data = dict(zip(self.keys, row))
+        for key, converter in self.converters:
+            data[key] = converter(data[key], **converter_kwargs)
+        return data
+
+    def build(self, queryset, **converter_kwargs):
+        return [
+            self(row, **converter_kwargs)
+            for row in queryset.values_list(*self.columns)
+        ]
+
+
+def get_file_url(name, storage, request=None):
+    """URL файла так же, как его отдаёт FileField в DRF."""
+    if not name:
+        return None
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def build_absolute_uri(url, request):
+    return request.build_absolute_uri(url) if url else url
+
+
+RECIPE_IMAGE_STORAGE = Recipe._meta.get_field('image').storage
+AVATAR_STORAGE = User._meta.get_field('avatar').storage
+
+INGREDIENT_ROW = RowBuilder(
+    (('id', 'id'), ('name', 'name'), ('measurement_unit', 'measurement_unit'))
+)
+RECIPE_SMALL_ROW = RowBuilder(
+    (('id', 'id'), ('name', 'name'), ('image', 'image'),
+     ('cooking_time', 'cooking_time')),
+    {'image': lambda name, request: get_file_url(
+        name, RECIPE_IMAGE_STORAGE, request)}
+)
+RECIPE_ROW = RowBuilder(
+    (('id', 'id'), ('name', 'name'), ('image', 'image'), ('text', 'text'),
+     ('cooking_time', 'cooking_time'), ('author_id', 'author_id'),
+     ('updated_at', 'updated_at')),
+    {'image': lambda name: get_file_url(name, RECIPE_IMAGE_STORAGE)}
+)
+RECIPE_TAG_ROW = RowBuilder(
+    (('recipe_id', 'recipe_id'), ('id', 'tag_id'), ('name', 'tag__name'),
+     ('slug', 'tag__slug'))
+)
+RECIPE_INGREDIENT_ROW = RowBuilder(
+    (('recipe_id', 'recipe_id'), ('id', 'ingredient_id'),
+     ('name', 'ingredient__name'),
+     ('measurement_unit', 'ingredient__measurement_unit'),
+     ('amount', 'amount'))
+)
+AUTHOR_ROW = RowBuilder(
+    (('email', 'email'), ('id', 'id'), ('username', 'username'),
+     ('first_name', 'first_name'), ('last_name', 'last_name'),
+     ('is_subscribed', 'id'), ('avatar', 'avatar')),
+    {'is_subscribed': lambda value: False,
+     'avatar': lambda name: get_file_url(name, AVATAR_STORAGE)}
+)
+
+
+def build_recipe_fragments(recipe_rows):
+    """
+    Фрагменты рецептов в формате RecipeListSerializer.get_fragment:
+    пятью запросами на всю страницу вместо запросов на каждый рецепт.
+    Теги и состав упорядочены так же, как Recipe.ordered_tags
+    и Recipe.ordered_ingredients.
+    """
+    recipe_ids = [row['id'] for row in recipe_rows]
+    tags = {recipe_id: [] for recipe_id in recipe_ids}
+    for tag in RECIPE_TAG_ROW.build(
+            Recipe.tags.through.objects.filter(
+                recipe_id__in=recipe_ids).order_by(
+                    *(f'tag__{field}' for field in RECIPE_TAGS_ORDERING))):
+        tags[tag.pop('recipe_id')].append(tag)
+    ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+    for ingredient in RECIPE_INGREDIENT_ROW.build(
+            IngredientRecipe.objects.filter(
+                recipe_id__in=recipe_ids).order_by(
+                    *RECIPE_INGREDIENTS_ORDERING)):
+        ingredients[ingredient.pop('recipe_id')].append(ingredient)
+    authors = {
+        author['id']: author
+        for author in AUTHOR_ROW.build(User.objects.filter(
+            id__in={row['author_id'] for row in recipe_rows}))
+    }
+    return {
+        row['id']: {
+            'id': row['id'],
+            'tags': tags[row['id']],
+            'author': authors[row['author_id']],
+            'ingredients': ingredients[row['id']],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'name': row['name'],
+            'image': row['image'],
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+        }
+        for row in recipe_rows
+    }
+
+
+def get_user_recipe_flags(user, recipe_ids, author_ids):
+    """Избранное, покупки и подписки пользователя для страницы рецептов."""
+    if not user.is_authenticated:
+        return set(), set(), set()
+    return (
+        set(Favorite.objects.filter(
+            user=user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True)),
+        set(ShoppingCart.objects.filter(
+            user=user, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True)),
+        set(Follow.objects.filter(
+            user=user, following_id__in=author_ids
+        ).values_list('following_id', flat=True)),
+    )
+
+
+def build_recipe_list(rows, request):
+    """
+    Страница рецептов в формате RecipeListSerializer. Общая часть
+    берётся из того же кэша фрагментов одним get_many, недостающие
+    фрагменты собираются из values_list и кэшируются.
+    """
+    recipe_rows = [RECIPE_ROW(row) for row in rows]
+    keys = {
+        row['id']: get_recipe_fragment_key(row['id'], row['updated_at'])
+        for row in recipe_rows
+    }
+    cached = cache.get_many(keys.values())
+    fragments = {
+        recipe_id: cached[key]
+        for recipe_id, key in keys.items() if key in cached
+    }
+    missing = [row for row in recipe_rows if row['id'] not in fragments]
+    if missing:
+        built = build_recipe_fragments(missing)
+        cache.set_many(
+            {keys[recipe_id]: fragment
+             for recipe_id, fragment in built.items()},
+            RECIPE_FRAGMENT_CACHE_TIMEOUT
+        )
+        fragments.update(built)
+    favorited, in_shopping_cart, subscribed = get_user_recipe_flags(
+        request.user, list(keys), {row['author_id'] for row in recipe_rows})
+    data = []
+    for row in recipe_rows:
+        recipe = dict(fragments[row['id']])
+        recipe['author'] = dict(
+            recipe['author'],
+            is_subscribed=row['author_id'] in subscribed,
+            avatar=build_absolute_uri(recipe['author']['avatar'], request)
+        )
+        recipe['is_favorited'] = row['id'] in favorited
+        recipe['is_in_shopping_cart'] = row['id'] in in_shopping_cart
+        recipe['image'] = build_absolute_uri(recipe['image'], request)
+        data.append(recipe)
+    return data
@@ -0,0 +1,113 @@
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+from .constants import (SINGLE_FLIGHT_LOCK_KEY, SINGLE_FLIGHT_POLL_INTERVAL,
+                        SINGLE_FLIGHT_RESULT_KEY, SINGLE_FLIGHT_RESULT_TIMEOUT,
+                        SINGLE_FLIGHT_WAIT_TIMEOUT)
+
+MISSING = object()
+
+
+class Call:
+    """Выполняющееся вычисление, результат которого ждут другие потоки."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def get_shared_single_flight_cache():
+    alias = settings.SINGLE_FLIGHT_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+class SingleFlight:
+    """
+    Объединяет одинаковые одновременные вычисления: первое выполняется,
+    остальные ждут его результата. Внутри процесса потоки ждут события,
+    а при заданном SINGLE_FLIGHT_CACHE_ALIAS воркеры договариваются
+    через блокировку в общем кэше, где результат хранится
+    SINGLE_FLIGHT_RESULT_TIMEOUT секунд. Не дождавшись результата
+    за wait_timeout секунд, вызывающий вычисляет его сам.
+    """
+
+    def __init__(self, wait_timeout=SINGLE_FLIGHT_WAIT_TIMEOUT,
+                 result_timeout=SINGLE_FLIGHT_RESULT_TIMEOUT):
+        self.wait_timeout = wait_timeout
+        self.result_timeout = result_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Call()
+        if not leader:
+            if not call.done.wait(self.wait_timeout):
+                return func()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = self.run_shared(key, func)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def run_shared(self, key, func):
+        shared_cache = get_shared_single_flight_cache()
+        if shared_cache is None:
+            return func()
+        lock_key = SINGLE_FLIGHT_LOCK_KEY.format(key)
+        result_key = SINGLE_FLIGHT_RESULT_KEY.format(key)
+        if shared_cache.add(lock_key, True, self.wait_timeout):
+            try:
+                result = func()
+                shared_cache.set(result_key, result, self.result_timeout)
+                return result
+            finally:
+                shared_cache.delete(lock_key)
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            result = shared_cache.get(result_key, MISSING)
+            if result is not MISSING:
+                return result
+            if shared_cache.get(lock_key) is None:
+                # Вычисление в другом воркере завершилось ошибкой.
+                break
+            time.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        return func()
+
+
+single_flight = SingleFlight()
+
+
+def get_coalescing_key(request):
+    """Ключ запроса, не зависящий от порядка параметров."""
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+    return hashlib.sha1(url.encode()).hexdigest()
+
+
+def coalesce(request, func):
+    """
+    Объединяет одинаковые одновременные безопасные запросы
+    анонимных пользователей, остальные выполняет как обычно.
+    """
+    if request.method not in SAFE_METHODS or request.user.is_authenticated:
+        return func()
+    return single_flight.do(get_coalescing_key(request), func)
@@ -1,3 +1,52 @@
 RECIPES_LIMIT = 6
 MAX_HASH = 10
 RECIPE_QUERY_PARAM = 'limit'
+TAG_MAP_CACHE_KEY = 'api:tag_ids_by_slug'
+TAG_MAP_CACHE_TIMEOUT = 60 * 60
+TAGS_MODE_ANY = 'any'
+TAGS_MODE_ALL = 'all'
+RECIPE_FRAGMENT_CACHE_KEY = 'api:recipe_fragment:v3:{}:{}'
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+RECIPE_FRAGMENT_AUTHOR_FIELDS = frozenset(
+    ('email', 'username', 'first_name', 'last_name', 'avatar')
+)
+RECIPE_FRAGMENT_TAG_FIELDS = frozenset(('name', 'slug'))
+RECIPE_FRAGMENT_INGREDIENT_FIELDS = frozenset(('name', 'measurement_unit'))
+AUTH_TOKEN_CACHE_KEY = 'api:auth_token:v2:{}'
+AUTH_USER_CACHE_FIELDS = (
+    'id', 'email', 'username', 'first_name', 'last_name', 'avatar',
+    'is_staff', 'is_superuser'
+)
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+AUTH_TOKEN_CACHE_MAXSIZE = 10000
+THROTTLE_WINDOW_BUCKETS = 10
+RECIPE_ORDERING_POPULAR = 'popular'
+RECIPE_ORDERING_TRENDING = 'trending'
+MATCH_INGREDIENTS_PARAM = 'ingredients'
+MATCH_MAX_LIMIT = 100
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+EXPAND_PARAM = 'expand'
+CHANGES_CURSOR_PARAM = 'since'
+CHANGES_LIMIT = 1000
+CHANGES_SETTLE_SECONDS = 2
+BATCH_MAX_REQUESTS = 20
+BATCH_METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+BATCH_URL_PREFIX = '/api/'
+SINGLE_FLIGHT_LOCK_KEY = 'api:single_flight:lock:{}'
+SINGLE_FLIGHT_RESULT_KEY = 'api:single_flight:result:{}'
+SINGLE_FLIGHT_WAIT_TIMEOUT = 5
+SINGLE_FLIGHT_RESULT_TIMEOUT = 1
+SINGLE_FLIGHT_POLL_INTERVAL = 0.05
+CATALOG_SHARD_PREFIX_LENGTH = 2
+CATALOG_VERSIONS_KEPT = 2
+CATALOG_VERSION_PREFIX = 'catalog-'
+CATALOG_CURRENT_LINK = 'current'
+FACETS_PARAM = 'facets'
+COOKING_TIME_BUCKETS = (15, 30, 60, 120)
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+PROFILE_SQL_LIMIT = 1000
+PROFILE_STACK_DEPTH = 10
+PROFILE_STATS_LIMIT = 50
@@ -1,25 +1,85 @@
+from django.db.models import Case, Count, Value, When
 from django_filters.rest_framework import FilterSet, filters
 from rest_framework.filters import SearchFilter
 
+from .constants import (COOKING_TIME_BUCKETS, RECIPE_ORDERING_POPULAR,
+                        RECIPE_ORDERING_TRENDING, TAGS_MODE_ALL, TAGS_MODE_ANY)
+from .utils import get_tag_ids_by_slug
+from food.constants import MIN_COOKING_TIME
 from food.models import Recipe
 
 
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids_by_slug()]
+
+
+class TagsFilter(filters.MultipleChoiceFilter):
+    """
+    Фильтр рецептов по слагам тегов.
+    Слаги переводятся в id по закэшированной карте тегов, а отбор
+    идёт подзапросом к промежуточной таблице, поэтому JOIN с тегами
+    и DISTINCT не нужны.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('choices', get_tag_choices)
+        kwargs.setdefault('distinct', False)
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        tag_map = get_tag_ids_by_slug()
+        tag_ids = {tag_map[slug] for slug in value if slug in tag_map}
+        recipe_tags = Recipe.tags.through.objects.filter(tag_id__in=tag_ids)
+        if self.parent.form.cleaned_data.get('tags_mode') == TAGS_MODE_ALL:
+            recipe_tags = recipe_tags.values('recipe_id').annotate(
+                tags_count=Count('tag_id')
+            ).filter(tags_count=len(tag_ids))
+        return qs.filter(id__in=recipe_tags.values('recipe_id'))
+
+
 class RecipeFilter(FilterSet):
     """Кастомный фильтр для рецептов"""
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug',
+    tags = TagsFilter()
+    tags_mode = filters.ChoiceFilter(
+        choices=((TAGS_MODE_ANY, TAGS_MODE_ANY),
+                 (TAGS_MODE_ALL, TAGS_MODE_ALL)),
+        method='get_tags_mode'
     )
+    cooking_time_min = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='gte')
+    cooking_time_max = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte')
     is_favorited = filters.NumberFilter(
         method='get_is_favorited'
     )
     is_in_shopping_cart = filters.NumberFilter(
         method='get_is_in_shopping_cart'
     )
+    ordering = filters.ChoiceFilter(
+        choices=((RECIPE_ORDERING_POPULAR, RECIPE_ORDERING_POPULAR),
+                 (RECIPE_ORDERING_TRENDING, RECIPE_ORDERING_TRENDING)),
+        method='get_ordering'
+    )
 
     class Meta:
         model = Recipe
         fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
 
+    def get_tags_mode(self, queryset, name, value):
+        # Режим учитывается в TagsFilter, сам по себе не фильтрует.
+        return queryset
+
+    def get_ordering(self, queryset, name, value):
+        """Сортировка по заранее рассчитанному рейтингу рецепта."""
+        field = {
+            RECIPE_ORDERING_POPULAR: 'score__popularity',
+            RECIPE_ORDERING_TRENDING: 'score__trending',
+        }[value]
+        return queryset.filter(score__isnull=False).order_by(
+            f'-{field}', '-id')
+
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
             return queryset.filter(favorite__user=self.request.user)
@@ -31,6 +91,42 @@ class RecipeFilter(FilterSet):
         return queryset
 
 
+def get_tag_facet(queryset):
+    """Число рецептов выборки по каждому тегу одним запросом."""
+    counts = dict(
+        Recipe.tags.through.objects.filter(
+            recipe_id__in=queryset.order_by().values('id')
+        ).values('tag_id').annotate(
+            count=Count('recipe_id')
+        ).order_by().values_list('tag_id', 'count')
+    )
+    return {
+        slug: counts.get(tag_id, 0)
+        for slug, tag_id in get_tag_ids_by_slug().items()
+    }
+
+
+def get_cooking_time_facet(queryset):
+    """
+    Гистограмма времени приготовления по интервалам
+    COOKING_TIME_BUCKETS одним запросом.
+    """
+    counts = dict(
+        queryset.order_by().annotate(bucket=Case(
+            *(When(cooking_time__lte=edge, then=Value(index))
+              for index, edge in enumerate(COOKING_TIME_BUCKETS)),
+            default=Value(len(COOKING_TIME_BUCKETS))
+        )).values('bucket').annotate(
+            count=Count('id')
+        ).order_by().values_list('bucket', 'count')
+    )
+    bounds = (MIN_COOKING_TIME - 1,) + COOKING_TIME_BUCKETS + (None,)
+    return [
+        {'min': low + 1, 'max': high, 'count': counts.get(index, 0)}
+        for index, (low, high) in enumerate(zip(bounds, bounds[1:]))
+    ]
+
+
 class IngredientFilter(SearchFilter):
     """Фильтрация для ингредиентов."""
 
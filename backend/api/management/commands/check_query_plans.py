@@ -0,0 +1,53 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.query_plans import (check_plan, get_hot_queries, get_plan,
+                             get_sample_objects)
+
+
+class Command(BaseCommand):
+    """
+    Проверяет через EXPLAIN, что горячие запросы API читают таблицы
+    по индексам. На маленькой базе планировщик предпочитает
+    последовательное чтение, поэтому для проверки наличия и
+    применимости индексов есть флаг --no-seqscan.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-seqscan', action='store_true',
+            help='Запретить планировщику последовательное чтение.'
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Выводить планы всех запросов, а не только ошибочных.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Query plans are checked on PostgreSQL only')
+        user, tag, ingredient = get_sample_objects()
+        if user is None or tag is None or ingredient is None:
+            raise CommandError('Users, tags and ingredients are required')
+        failed = []
+        queries = get_hot_queries(user, tag, ingredient)
+        for name, (queryset, expected) in queries.items():
+            # SET LOCAL действует до конца транзакции.
+            with transaction.atomic():
+                plan = get_plan(queryset, options['no_seqscan'])
+            errors = check_plan(plan, expected)
+            if errors:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: {"; ".join(errors)}'))
+            else:
+                self.stdout.write(f'{name}: OK')
+            if errors or options['verbose_plans']:
+                self.stdout.write(json.dumps(plan, indent=2))
+        if failed:
+            raise CommandError(f'Queries without index scans: {failed}')
+        self.stdout.write(
+            self.style.SUCCESS(f'QUERY PLANS CHECKED: {len(queries)}')
+        )
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.snapshots import publish_catalog
+
+
+class Command(BaseCommand):
+    """
+    Публикует снимки тегов и ингредиентов в CATALOG_SNAPSHOT_ROOT,
+    откуда их отдаёт nginx. После изменений через приложение снимки
+    обновляются сами, команда нужна для первой публикации
+    и массовой загрузки данных.
+    """
+
+    def handle(self, *args, **options):
+        if not settings.CATALOG_SNAPSHOT_ROOT:
+            raise CommandError('CATALOG_SNAPSHOT_ROOT is not set')
+        version = publish_catalog()
+        self.stdout.write(
+            self.style.SUCCESS(f'CATALOG PUBLISHED: {version}')
+        )
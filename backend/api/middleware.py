@@ -0,0 +1,62 @@
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedTokenAuthentication
+from .constants import PROFILE_HEADER, PROFILE_ID_HEADER, PROFILE_QUERY_PARAM
+from .profiling import RequestProfiler
+
+
+class RateLimitHeadersMiddleware:
+    """Добавляет в ответ заголовки с лимитом и остатком запросов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        rate_limit = getattr(request, 'rate_limit', None)
+        if rate_limit is not None:
+            limit, remaining = rate_limit
+            response['X-RateLimit-Limit'] = limit
+            response['X-RateLimit-Remaining'] = remaining
+        return response
+
+
+def get_staff_user(request):
+    """Сотрудник, отправивший запрос, по сессии или токену."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            user, _ = (
+                CachedTokenAuthentication().authenticate(request)
+                or (None, None)
+            )
+        except AuthenticationFailed:
+            return None
+    if user is not None and user.is_staff:
+        return user
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запрос сотрудника с заголовком X-Profile: 1
+    или параметром _profile. Профиль сохраняется в базе и доступен
+    в админке, его id возвращается в заголовке X-Profile-Id.
+    Остальные запросы проходят без накладных расходов.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (request.META.get(PROFILE_HEADER) != '1'
+                and PROFILE_QUERY_PARAM not in request.GET):
+            return self.get_response(request)
+        user = get_staff_user(request)
+        if user is None:
+            return self.get_response(request)
+        with RequestProfiler() as profiler:
+            response = self.get_response(request)
+        profile = profiler.save(request, response, user)
+        response[PROFILE_ID_HEADER] = profile.id
+        return response
@@ -0,0 +1,29 @@
+from foodgram_backend.db_routers import (is_pinned_to_primary, pin_to_primary,
+                                         set_read_replica)
+from rest_framework import status
+from rest_framework.permissions import SAFE_METHODS
+
+
+class ReplicaReadMixin:
+    """
+    Выполняет безопасные запросы к вьюсету на репликах базы.
+    После успешного изменения данных пользователь на время
+    закрепляется за основной базой.
+    """
+    replica_actions = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in SAFE_METHODS
+                and (self.replica_actions is None
+                     or self.action in self.replica_actions)
+                and not is_pinned_to_primary(request.user)):
+            set_read_replica(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        set_read_replica(False)
+        if (request.method not in SAFE_METHODS
+                and request.user.is_authenticated
+                and status.is_success(response.status_code)):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
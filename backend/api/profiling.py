@@ -0,0 +1,93 @@
+import cProfile
+import io
+import marshal
+import pstats
+import time
+import traceback
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .constants import (PROFILE_SQL_LIMIT, PROFILE_STACK_DEPTH,
+                        PROFILE_STATS_LIMIT)
+from food.models import RequestProfile
+
+
+def get_project_stack():
+    """Кадры стека из кода проекта, без Django и прочих библиотек."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        f'{frame.filename[len(base_dir) + 1:]}:{frame.lineno} in {frame.name}'
+        for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+    ]
+    return frames[-PROFILE_STACK_DEPTH:]
+
+
+class RequestProfiler:
+    """
+    Снимает профиль cProfile и SQL-запросы всех баз в текущем потоке.
+    Используется как контекстный менеджер вокруг обработки запроса.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.sql_count = 0
+        self.sql_duration = 0
+        self.duration = 0
+        self._stack = ExitStack()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.sql_count += 1
+            self.sql_duration += duration
+            if len(self.queries) < PROFILE_SQL_LIMIT:
+                self.queries.append({
+                    'alias': context['connection'].alias,
+                    'sql': sql,
+                    'time': round(duration, 3),
+                    'stack': get_project_stack(),
+                })
+
+    def __enter__(self):
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        self._start = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.duration = (time.perf_counter() - self._start) * 1000
+        self._stack.close()
+
+    def get_stats(self):
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats(
+            pstats.SortKey.CUMULATIVE).print_stats(PROFILE_STATS_LIMIT)
+        return stream.getvalue()
+
+    def save(self, request, response, user):
+        """Сохраняет профиль; файл профиля совместим с pstats."""
+        self.profiler.create_stats()
+        # pstats.Stats забирает статистику у профайлера, сериализуем до неё.
+        dump = marshal.dumps(self.profiler.stats)
+        return RequestProfile.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path(),
+            status_code=response.status_code,
+            duration=self.duration,
+            sql_count=self.sql_count,
+            sql_duration=self.sql_duration,
+            stats=self.get_stats(),
+            queries=self.queries,
+            profile=dump,
+        )
@@ -0,0 +1,123 @@
+import re
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+
+from .filters import RecipeFilter
+from food.models import Ingredient, IngredientRecipe, Recipe, Tag
+
+User = get_user_model()
+
+PARTITION_SUFFIX = re.compile(r'_p\d+$')
+INDEX_SCANS = ('Index Scan', 'Index Only Scan', 'Bitmap Heap Scan')
+
+
+def get_hot_queries(user, tag, ingredient):
+    """
+    Горячие запросы API и таблицы, которые каждый из них должен
+    читать по индексу, с колонкой условия индекса или None.
+    """
+    request = SimpleNamespace(user=user)
+
+    def recipes(**data):
+        return RecipeFilter(data, Recipe.objects.all(), request=request).qs
+
+    return {
+        'recipes_by_tags': (
+            recipes(tags=[tag.slug]),
+            {'food_recipe_tags': 'tag_id'}),
+        'recipes_by_author': (
+            recipes(author=user.id),
+            {'food_recipe': 'author_id'}),
+        'favorited_recipes': (
+            recipes(is_favorited=1),
+            {'food_favorite': 'user_id'}),
+        'recipes_in_shopping_cart': (
+            recipes(is_in_shopping_cart=1),
+            {'food_shoppingcart': 'user_id'}),
+        'shopping_cart_ingredients': (
+            IngredientRecipe.objects.filter(
+                recipe__shoppingcart__user=user,
+                recipe__deleted_at__isnull=True
+            ).values('ingredient__name', 'amount'),
+            {'food_shoppingcart': 'user_id', 'food_ingredientrecipe': None}),
+        'subscriptions': (
+            User.objects.filter(following__user=user),
+            {'users_follow': 'user_id'}),
+        'ingredient_search': (
+            Ingredient.objects.filter(
+                name__istartswith=ingredient.name[:3]),
+            {'food_ingredient': 'name'}),
+    }
+
+
+def get_plan(queryset, no_seqscan=False):
+    """План запроса в формате EXPLAIN (FORMAT JSON) PostgreSQL."""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if no_seqscan:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    return plan[0]['Plan']
+
+
+def get_table_scans(node):
+    """
+    Чтения таблиц в плане: (таблица, тип узла, условие индекса).
+    Секции приводятся к имени секционированной таблицы, условие
+    Bitmap Heap Scan берётся из его Bitmap Index Scan.
+    """
+    scans = []
+    if 'Relation Name' in node:
+        condition = node.get('Index Cond', '')
+        if node['Node Type'] == 'Bitmap Heap Scan':
+            condition = ' '.join(
+                child.get('Index Cond', '')
+                for child in get_child_nodes(node)
+            )
+        scans.append((
+            PARTITION_SUFFIX.sub('', node['Relation Name']),
+            node['Node Type'],
+            condition
+        ))
+    for child in node.get('Plans', ()):
+        scans.extend(get_table_scans(child))
+    return scans
+
+
+def get_child_nodes(node):
+    for child in node.get('Plans', ()):
+        yield child
+        yield from get_child_nodes(child)
+
+
+def check_plan(plan, expected):
+    """
+    Ошибки плана: таблица из expected прочитана не по индексу
+    или индекс использован без условия по нужной колонке.
+    """
+    scans = get_table_scans(plan)
+    errors = []
+    for table, column in expected.items():
+        table_scans = [scan for scan in scans if scan[0] == table]
+        if not table_scans:
+            errors.append(f'{table}: not in plan')
+        elif any(scan[1] not in INDEX_SCANS for scan in table_scans):
+            errors.append(f'{table}: {table_scans[0][1]}')
+        elif column and not any(
+                re.search(rf'\b{column}\b', scan[2])
+                for scan in table_scans):
+            errors.append(f'{table}: no index condition on {column}')
+    return errors
+
+
+def get_sample_objects():
+    """Пользователь, тег и ингредиент для подстановки в запросы."""
+    return (
+        User.objects.order_by('id').first(),
+        Tag.objects.order_by('id').first(),
+        Ingredient.objects.order_by('id').first(),
+    )
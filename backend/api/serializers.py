@@ -1,11 +1,20 @@
+from functools import partial
+from urllib.parse import urlsplit
+
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.validators import UniqueTogetherValidator
 
-from .constants import RECIPES_LIMIT
-from .utils import Base64ImageField, add_ingredients
+from .builders import RECIPE_SMALL_ROW
+from .constants import (BATCH_METHODS, BATCH_URL_PREFIX,
+                        RECIPE_FRAGMENT_CACHE_TIMEOUT, RECIPES_LIMIT)
+from .utils import (Base64ImageField, add_ingredients, get_collapsed_fieldset,
+                    get_recipe_fragment_key, get_sparse_fieldset)
 from food.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                          ShoppingCart, Tag)
 from users.models import Follow
@@ -13,7 +22,34 @@ from users.models import Follow
 User = get_user_model()
 
 
-class CustomUserSerializer(UserSerializer):
+class SparseFieldsMixin:
+    """
+    Оставляет в сериализаторе только поля, запрошенные параметрами
+    fields и omit. Непрошенные поля, в том числе SerializerMethodField,
+    не вычисляются. Вложенные объекты из collapsed_fields при явном
+    fields отдаются как id, если они не перечислены в expand.
+    """
+    collapsed_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.is_sparse = False
+        request = self.context.get('request')
+        if request is None:
+            return
+        fieldset = get_sparse_fieldset(request.query_params, self.fields)
+        if fieldset is None:
+            return
+        self.is_sparse = True
+        for name in set(self.fields) - fieldset:
+            self.fields.pop(name)
+        collapsed = get_collapsed_fieldset(
+            request.query_params, self.collapsed_fields)
+        for name in collapsed & set(self.fields):
+            self.fields[name] = self.collapsed_fields[name]()
+
+
+class CustomUserSerializer(SparseFieldsMixin, UserSerializer):
     """Сериализатор пользователя."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -53,6 +89,11 @@ class UserAvatarSerializer(serializers.ModelSerializer):
             )
         return super().validate(data)
 
+    def update(self, instance, validated_data):
+        instance.avatar = validated_data['avatar']
+        instance.save(update_fields=('avatar',))
+        return instance
+
 
 class TagSerializer(serializers.ModelSerializer):
     """Сериализатор для работы с тегами."""
@@ -97,18 +138,25 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeListSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для получения информации о рецептах."""
-    tags = TagSerializer(many=True, read_only=True)
+    tags = TagSerializer(many=True, read_only=True, source='ordered_tags')
     ingredients = IngredientRecipeSerializer(
         many=True,
-        source='recipe_ingredients',
+        source='ordered_ingredients',
         read_only=True)
     author = CustomUserSerializer(read_only=True)
     image = Base64ImageField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
+    collapsed_fields = {
+        'author': partial(serializers.PrimaryKeyRelatedField,
+                          read_only=True),
+        'tags': partial(serializers.PrimaryKeyRelatedField,
+                        many=True, read_only=True, source='ordered_tags'),
+    }
+
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
@@ -129,6 +177,50 @@ class RecipeListSerializer(serializers.ModelSerializer):
             and obj.shoppingcart.filter(user=request.user).exists()
         )
 
+    def get_is_subscribed(self, obj):
+        request = self.context.get('request')
+        return (
+            request.user.is_authenticated
+            and Follow.objects.filter(
+                user=request.user, following_id=obj.author_id
+            ).exists()
+        )
+
+    def to_representation(self, instance):
+        """
+        Общая для всех пользователей часть рецепта берётся из кэша,
+        поля, зависящие от пользователя, подставляются при каждом запросе.
+        """
+        if self.is_sparse:
+            return super().to_representation(instance)
+        key = get_recipe_fragment_key(instance.id, instance.updated_at)
+        fragment = cache.get(key)
+        if fragment is None:
+            data = super().to_representation(instance)
+            cache.set(key, self.get_fragment(data, instance),
+                      RECIPE_FRAGMENT_CACHE_TIMEOUT)
+            return data
+        request = self.context.get('request')
+        fragment['is_favorited'] = self.get_is_favorited(instance)
+        fragment['is_in_shopping_cart'] = self.get_is_in_shopping_cart(
+            instance)
+        fragment['author']['is_subscribed'] = self.get_is_subscribed(instance)
+        for data in (fragment, fragment['author']):
+            for field in ('image', 'avatar'):
+                if data.get(field):
+                    data[field] = request.build_absolute_uri(data[field])
+        return fragment
+
+    @staticmethod
+    def get_fragment(data, instance):
+        """Убирает из рецепта данные, зависящие от запроса."""
+        fragment = dict(data, is_favorited=False, is_in_shopping_cart=False)
+        fragment['author'] = dict(data['author'], is_subscribed=False)
+        fragment['image'] = instance.image.url if instance.image else None
+        avatar = instance.author.avatar
+        fragment['author']['avatar'] = avatar.url if avatar else None
+        return fragment
+
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     """Сериализатор для создания/изменения/удаления рецептов."""
@@ -177,6 +269,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Нужно загрузить изображение.')
         return image
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -187,6 +280,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         add_ingredients(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients = validated_data.pop('ingredients')
         instance.ingredients.clear()
@@ -242,20 +336,22 @@ class SubscriptionsSerializer(CustomUserSerializer):
     def get_recipes(self, obj):
         """Получает список рецептов."""
         request = self.context.get('request')
+        recipes = obj.recipes.all()
         if request:
             recipes_limit = request.query_params.get('recipes_limit')
             if recipes_limit:
                 try:
-                    recipes = obj.recipes.all()[:int(recipes_limit)]
+                    recipes = recipes[:int(recipes_limit)]
                 except (ValueError, TypeError):
                     pass
-        return RecipeSmallSerializer(
-            recipes[:RECIPES_LIMIT], many=True,
-            context={'request': request}).data
+        return RECIPE_SMALL_ROW.build(
+            recipes[:RECIPES_LIMIT], request=request)
 
 
 class FollowSerializer(serializers.ModelSerializer):
     """Сериализатор для добавления/удаления подписки на пользователей."""
+    following = serializers.PrimaryKeyRelatedField(
+        queryset=User.objects.all())
 
     class Meta:
         model = Follow
@@ -321,3 +417,19 @@ class ShoppingCartSerializer(BaseFavoriteShoppingCartSerializer):
     class Meta(BaseFavoriteShoppingCartSerializer.Meta):
         model = ShoppingCart
         fields = '__all__'
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    """Сериализатор одного запроса из пакета."""
+    method = serializers.ChoiceField(choices=BATCH_METHODS, default='GET')
+    url = serializers.CharField()
+    body = serializers.JSONField(required=False)
+
+    def validate_url(self, value):
+        path = urlsplit(value).path
+        if not path.startswith(BATCH_URL_PREFIX):
+            raise ValidationError(
+                f'Адрес должен начинаться с {BATCH_URL_PREFIX}')
+        if path.rstrip('/') == reverse('api:batch').rstrip('/'):
+            raise ValidationError('Вложенные пакеты не поддерживаются')
+        return value
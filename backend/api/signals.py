@@ -0,0 +1,254 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens
+from .constants import (RECIPE_FRAGMENT_AUTHOR_FIELDS,
+                        RECIPE_FRAGMENT_INGREDIENT_FIELDS,
+                        RECIPE_FRAGMENT_TAG_FIELDS)
+from .snapshots import catalog_publisher
+from .utils import invalidate_recipe_fragments, invalidate_tag_map
+from food.matching import invalidate_ingredient_index
+from food.models import (ChangeLog, Favorite, Ingredient, IngredientRecipe,
+                         Recipe, RecipeScore, ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    """Сбрасывает кэш тегов при их изменении."""
+    invalidate_tag_map()
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    """Перепубликует снимки каталога после фиксации изменений."""
+    if settings.CATALOG_SNAPSHOT_ROOT:
+        transaction.on_commit(catalog_publisher.schedule)
+
+
+def has_changed_fields(instance, fields, update_fields):
+    """
+    Отличаются ли сохраняемые поля fields объекта от записанных
+    в базе. Новые объекты ещё не выводятся в рецептах.
+    """
+    if instance._state.adding:
+        return False
+    if update_fields is not None:
+        fields = fields & set(update_fields)
+    fields = fields - instance.get_deferred_fields()
+    if not fields:
+        return False
+    stored = type(instance)._default_manager.filter(
+        pk=instance.pk).values(*fields).first()
+    if stored is None:
+        return True
+    return any(
+        stored[name] != instance._meta.get_field(name).get_prep_value(
+            getattr(instance, name))
+        for name in fields
+    )
+
+
+RECIPE_FRAGMENT_FIELDS = {
+    User: RECIPE_FRAGMENT_AUTHOR_FIELDS,
+    Tag: RECIPE_FRAGMENT_TAG_FIELDS,
+    Ingredient: RECIPE_FRAGMENT_INGREDIENT_FIELDS,
+}
+
+
+@receiver(pre_save, sender=User)
+@receiver(pre_save, sender=Tag)
+@receiver(pre_save, sender=Ingredient)
+def recipe_fragment_source_saving(sender, instance, update_fields=None,
+                                  **kwargs):
+    """
+    Запоминает, меняет ли сохранение данные автора, тега или
+    ингредиента, которые выводятся во фрагментах рецептов.
+    """
+    instance._recipe_fragments_changed = has_changed_fields(
+        instance, RECIPE_FRAGMENT_FIELDS[sender], update_fields)
+
+
+@receiver(post_save, sender=Tag)
+def tag_recipes_changed(sender, instance, **kwargs):
+    """Сбрасывает фрагменты рецептов с изменённым тегом."""
+    if instance._recipe_fragments_changed:
+        invalidate_recipe_fragments(
+            instance.recipes.values_list('id', flat=True), log_changes=True)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    """Сбрасывает фрагменты рецептов удаляемого тега."""
+    invalidate_recipe_fragments(
+        instance.recipes.values_list('id', flat=True), log_changes=True)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Сбрасывает фрагменты рецептов при изменении их тегов. Изменения
+    со стороны тега записываются в журнал: рецепт не сохраняется.
+    """
+    if action == 'pre_clear' and reverse:
+        # После очистки рецепты тега уже не найти.
+        invalidate_recipe_fragments(
+            instance.recipes.values_list('id', flat=True), log_changes=True)
+        return
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_recipe_fragments((instance.id,))
+    elif pk_set:
+        invalidate_recipe_fragments(pk_set, log_changes=True)
+
+
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    """Сбрасывает кэши, зависящие от состава рецепта."""
+    invalidate_recipe_fragments((instance.recipe_id,))
+    invalidate_ingredient_index()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    """Сбрасывает фрагменты рецептов с изменённым ингредиентом."""
+    if instance._recipe_fragments_changed:
+        invalidate_recipe_fragments(
+            instance.recipe_ingredients.filter(
+                recipe__deleted_at__isnull=True
+            ).values_list('recipe_id', flat=True),
+            log_changes=True
+        )
+
+
+@receiver(post_save, sender=User)
+def author_changed(sender, instance, **kwargs):
+    """Сбрасывает фрагменты рецептов автора при изменении его данных."""
+    if instance._recipe_fragments_changed:
+        invalidate_recipe_fragments(
+            instance.recipes.values_list('id', flat=True), log_changes=True)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    """Сбрасывает кэш аутентификации при выходе пользователя."""
+    invalidate_tokens((instance.key,))
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """
+    Сбрасывает кэш аутентификации при изменении пользователя,
+    например смене пароля, деактивации или удалении.
+    """
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    keys = list(
+        Token.objects.filter(user=instance).values_list('key', flat=True))
+    invalidate_tokens(keys)
+    # Запрос из другого процесса мог закэшировать данные до фиксации.
+    transaction.on_commit(lambda: invalidate_tokens(keys))
+
+
+@receiver(request_started)
+def check_db_connections(sender, **kwargs):
+    """
+    Закрывает оборвавшиеся постоянные соединения с базой в начале
+    запроса, чтобы запрос открыл новое, а не упал с ошибкой.
+    """
+    if not settings.CONN_HEALTH_CHECKS:
+        return
+    for conn in connections.all():
+        if conn.connection is not None and not conn.is_usable():
+            conn.close()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    """Создаёт пустой рейтинг для нового рецепта."""
+    if created:
+        RecipeScore.objects.create(recipe=instance)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_score_changed(sender, instance, **kwargs):
+    """
+    Помечает рейтинг рецепта для пересчёта. Новые добавления
+    команда update_recipe_scores находит сама по дате создания.
+    """
+    RecipeScore.objects.filter(recipe_id=instance.recipe_id).update(
+        is_stale=True)
+
+
+@receiver(post_save, sender=Recipe)
+def log_recipe_saved(sender, instance, created, update_fields=None,
+                     **kwargs):
+    """Записывает создание или изменение рецепта в журнал."""
+    if update_fields and set(update_fields) <= {'short_url'}:
+        return
+    if created:
+        action = ChangeLog.CREATED
+    elif instance.deleted_at is not None:
+        action = ChangeLog.DELETED
+    else:
+        action = ChangeLog.UPDATED
+    ChangeLog.objects.create(
+        kind=ChangeLog.RECIPE,
+        action=action,
+        object_id=instance.id
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def log_recipe_deleted(sender, instance, **kwargs):
+    """Записывает удаление рецепта в журнал."""
+    ChangeLog.objects.create(
+        kind=ChangeLog.RECIPE,
+        action=ChangeLog.DELETED,
+        object_id=instance.id
+    )
+
+
+CHANGELOG_USER_RELATIONS = {
+    Favorite: (ChangeLog.FAVORITE, 'recipe_id'),
+    ShoppingCart: (ChangeLog.SHOPPING_CART, 'recipe_id'),
+    Follow: (ChangeLog.FOLLOW, 'following_id'),
+}
+
+
+def log_user_relation(sender, instance, action):
+    kind, object_field = CHANGELOG_USER_RELATIONS[sender]
+    ChangeLog.objects.create(
+        user_id=instance.user_id,
+        kind=kind,
+        action=action,
+        object_id=getattr(instance, object_field)
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Follow)
+def log_user_relation_created(sender, instance, created, **kwargs):
+    """Записывает добавление в избранное, покупки или подписки."""
+    if created:
+        log_user_relation(sender, instance, ChangeLog.CREATED)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Follow)
+def log_user_relation_deleted(sender, instance, **kwargs):
+    """Записывает удаление из избранного, покупок или подписок."""
+    log_user_relation(sender, instance, ChangeLog.DELETED)
@@ -0,0 +1,136 @@
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from .constants import (CATALOG_CURRENT_LINK, CATALOG_SHARD_PREFIX_LENGTH,
+                        CATALOG_VERSION_PREFIX, CATALOG_VERSIONS_KEPT)
+from .serializers import IngredientSerializer, TagSerializer
+from food.models import Ingredient, Tag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def write_snapshot(path, data):
+    """Записывает JSON и его сжатые версии для gzip_static и brotli_static."""
+    content = JSONRenderer().render(data)
+    path.write_bytes(content)
+    Path(f'{path}.gz').write_bytes(gzip.compress(content, mtime=0))
+    if brotli is not None:
+        Path(f'{path}.br').write_bytes(brotli.compress(content))
+
+
+def get_shard_names(prefix):
+    """
+    Имена файлов шарда в том виде, в каком префикс приходит
+    в $arg_name у nginx: частые варианты регистра, URL-кодированные.
+    """
+    return {
+        quote(variant, safe='')
+        for variant in (prefix.lower(), prefix.upper(), prefix.capitalize())
+    }
+
+
+def get_ingredient_shards(ingredients):
+    """
+    Ингредиенты по префиксам названий, как их отбирает
+    поиск по ^name: без учёта регистра и с сохранением порядка.
+    Префиксы с пробелами и запятыми поиск делит на части,
+    их обслуживает бэкенд.
+    """
+    shards = defaultdict(list)
+    for ingredient in ingredients:
+        name = ingredient['name'].lower()
+        for length in range(1, CATALOG_SHARD_PREFIX_LENGTH + 1):
+            prefix = name[:length]
+            if len(prefix) < length or any(
+                    char.isspace() or char == ',' for char in prefix):
+                break
+            shards[prefix].append(ingredient)
+    return shards
+
+
+def publish_catalog():
+    """
+    Публикует снимки списка тегов и каталога ингредиентов.
+    Новая версия собирается в отдельном каталоге и включается
+    атомарной заменой ссылки current, которую отдаёт nginx.
+    """
+    root = Path(settings.CATALOG_SNAPSHOT_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    version = Path(tempfile.mkdtemp(prefix=CATALOG_VERSION_PREFIX, dir=root))
+    version.chmod(0o755)
+    tags = TagSerializer(Tag.objects.all(), many=True).data
+    write_snapshot(version / 'tags.json', tags)
+    ingredients = IngredientSerializer(
+        Ingredient.objects.all(), many=True).data
+    write_snapshot(version / 'ingredients.json', ingredients)
+    shards = version / 'ingredients'
+    shards.mkdir()
+    for prefix, items in get_ingredient_shards(ingredients).items():
+        for name in get_shard_names(prefix):
+            write_snapshot(shards / f'{name}.json', items)
+    link = root / f'.{CATALOG_CURRENT_LINK}-{uuid.uuid4().hex}'
+    link.symlink_to(version.name)
+    os.replace(link, root / CATALOG_CURRENT_LINK)
+    # Предыдущую версию оставляем для запросов, которые nginx уже начал.
+    versions = sorted(
+        root.glob(f'{CATALOG_VERSION_PREFIX}*'),
+        key=lambda path: path.stat().st_mtime, reverse=True
+    )
+    for old_version in versions[CATALOG_VERSIONS_KEPT:]:
+        if old_version != version:
+            shutil.rmtree(old_version, ignore_errors=True)
+    return version
+
+
+class CatalogPublisher:
+    """
+    Публикует снимки каталога в фоновом потоке. Изменения, пришедшие
+    во время публикации, объединяются в одну следующую публикацию.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = False
+        self._running = False
+
+    def schedule(self):
+        with self._lock:
+            self._pending = True
+            if self._running:
+                return
+            self._running = True
+        threading.Thread(
+            target=self._run, name='catalog-publisher', daemon=True).start()
+
+    def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._pending:
+                        self._running = False
+                        return
+                    self._pending = False
+                publish_catalog()
+        except Exception:
+            with self._lock:
+                self._running = False
+            raise
+        finally:
+            connection.close()
+
+
+catalog_publisher = CatalogPublisher()
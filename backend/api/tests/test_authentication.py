@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+
+from api.authentication import (CachedTokenAuthentication, get_user_state,
+                                set_cached_user_state, token_cache)
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTest(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', first_name='user',
+            last_name='user', password='password')
+        self.token = Token.objects.create(user=self.user)
+        self.authentication = CachedTokenAuthentication()
+
+    def authenticate(self):
+        return self.authentication.authenticate_credentials(self.token.key)[0]
+
+    def test_cache_hit_does_not_query_database(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.username, 'user')
+        self.assertFalse(user.avatar)
+
+    def test_user_changes_invalidate_cache(self):
+        self.authenticate()
+        self.user.first_name = 'new'
+        self.user.save()
+        self.assertEqual(self.authenticate().first_name, 'new')
+        self.user.is_active = False
+        self.user.save(update_fields=('is_active',))
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_logout_invalidates_cache(self):
+        self.authenticate()
+        self.token.delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_cached_user_save_keeps_security_fields(self):
+        # Кэш другого процесса, не сброшенный сигналом.
+        state = get_user_state(self.user)
+        deleted_at = timezone.now()
+        User.objects.filter(pk=self.user.pk).update(
+            is_active=False, deleted_at=deleted_at, password='changed')
+        set_cached_user_state(self.token.key, state)
+        user = self.authenticate()
+        user.avatar = 'users/avatar.png'
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "users_user"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"is_active"', updates[0])
+        user = User.all_objects.get(pk=self.user.pk)
+        self.assertEqual(user.avatar, 'users/avatar.png')
+        self.assertFalse(user.is_active)
+        self.assertEqual(user.deleted_at, deleted_at)
+        self.assertEqual(user.password, 'changed')
@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from api.builders import INGREDIENT_ROW, RECIPE_SMALL_ROW
+from api.serializers import (IngredientSerializer, RecipeListSerializer,
+                             RecipeSmallSerializer)
+from food.counters import view_counter
+from food.models import Favorite, Ingredient, IngredientRecipe, Recipe, Tag
+from users.models import Follow
+
+User = get_user_model()
+
+FULL_FIELDS = {
+    'fields': ','.join(RecipeListSerializer.Meta.fields),
+    'expand': 'author,tags',
+}
+
+
+class BuildersGoldenTest(TestCase):
+    """Ответы быстрого пути совпадают с ответами сериализаторов побайтно."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user', first_name='user',
+            last_name='user', password='password')
+        cls.author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='author', last_name='author', password='password',
+            avatar='users/avatar.png')
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)
+        ]
+        for number in range(5):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}', text='Текст', cooking_time=number + 1,
+                author=cls.author if number % 2 else cls.user,
+                image='recipes/images/recipe.png')
+            recipe.tags.add(*reversed(tags[number % 2:]))
+            for ingredient in reversed(ingredients[number % 3:]):
+                IngredientRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=number + 10)
+            if number % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+        Follow.objects.create(user=cls.user, following=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        view_counter.flush()
+
+    def get_content(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def test_recipe_list_matches_serializer(self):
+        self.assertEqual(
+            self.get_content('/api/recipes/'),
+            self.get_content('/api/recipes/', FULL_FIELDS)
+        )
+
+    def test_recipe_list_does_not_depend_on_cache(self):
+        cold = self.get_content('/api/recipes/')
+        self.assertEqual(self.get_content('/api/recipes/'), cold)
+        cache.clear()
+        for recipe in Recipe.objects.all():
+            self.get_content(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(self.get_content('/api/recipes/'), cold)
+
+    def test_recipe_detail_does_not_depend_on_cache(self):
+        recipe = Recipe.objects.first()
+        url = f'/api/recipes/{recipe.id}/'
+        cold = self.get_content(url)
+        self.assertEqual(self.get_content(url), cold)
+        cache.clear()
+        self.get_content('/api/recipes/')
+        self.assertEqual(self.get_content(url), cold)
+        self.assertEqual(self.get_content(url, FULL_FIELDS), cold)
+
+    def test_ingredient_rows_match_serializer(self):
+        queryset = Ingredient.objects.all()
+        self.assertEqual(
+            JSONRenderer().render(INGREDIENT_ROW.build(queryset)),
+            JSONRenderer().render(
+                IngredientSerializer(queryset, many=True).data)
+        )
+
+    def test_recipe_small_rows_match_serializer(self):
+        request = Request(RequestFactory().get('/api/users/subscriptions/'))
+        queryset = Recipe.objects.all()
+        self.assertEqual(
+            JSONRenderer().render(
+                RECIPE_SMALL_ROW.build(queryset, request=request)),
+            JSONRenderer().render(RecipeSmallSerializer(
+                queryset, many=True, context={'request': request}).data)
+        )
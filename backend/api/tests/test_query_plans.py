@@ -0,0 +1,118 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from api.query_plans import check_plan, get_hot_queries, get_sample_objects
+from food.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                         ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+BITMAP_PLAN = {
+    'Node Type': 'Nested Loop',
+    'Plans': [
+        {
+            'Node Type': 'Bitmap Heap Scan',
+            'Relation Name': 'food_favorite_p3',
+            'Recheck Cond': '(user_id = 1)',
+            'Plans': [{
+                'Node Type': 'Bitmap Index Scan',
+                'Index Name': 'food_favorite_p3_user_id_recipe_id_key',
+                'Index Cond': '(user_id = 1)',
+            }],
+        },
+        {
+            'Node Type': 'Index Scan',
+            'Relation Name': 'food_recipe',
+            'Index Name': 'food_recipe_pkey',
+            'Index Cond': '(id = food_favorite.recipe_id)',
+        },
+    ],
+}
+
+SEQ_SCAN_PLAN = {
+    'Node Type': 'Hash Join',
+    'Plans': [
+        {'Node Type': 'Seq Scan', 'Relation Name': 'food_recipe'},
+        {
+            'Node Type': 'Hash',
+            'Plans': [{
+                'Node Type': 'Index Scan',
+                'Relation Name': 'users_follow_p0',
+                'Index Name': 'users_follow_p0_pkey',
+                'Index Cond': '(id > 1)',
+            }],
+        },
+    ],
+}
+
+
+def seed():
+    users = [
+        User.objects.create_user(
+            email=f'user{number}@example.com', username=f'user{number}',
+            first_name='user', last_name='user', password='password')
+        for number in range(3)
+    ]
+    tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+    ingredient = Ingredient.objects.create(
+        name='Молоко', measurement_unit='мл')
+    for number, user in enumerate(users):
+        recipe = Recipe.objects.create(
+            name=f'Рецепт {number}', text='Текст', cooking_time=1,
+            author=user, image='recipes/images/recipe.png')
+        recipe.tags.add(tag)
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1)
+        Favorite.objects.create(user=users[0], recipe=recipe)
+        ShoppingCart.objects.create(user=users[0], recipe=recipe)
+        if user != users[0]:
+            Follow.objects.create(user=users[0], following=user)
+
+
+class CheckPlanTest(SimpleTestCase):
+    """Разбор планов EXPLAIN (FORMAT JSON)."""
+
+    def test_partition_bitmap_scan_with_condition(self):
+        self.assertEqual(check_plan(
+            BITMAP_PLAN, {'food_favorite': 'user_id', 'food_recipe': None}
+        ), [])
+
+    def test_seq_scan_and_missing_condition(self):
+        self.assertEqual(check_plan(
+            SEQ_SCAN_PLAN,
+            {'food_recipe': None, 'users_follow': 'user_id',
+             'food_ingredient': None}
+        ), [
+            'food_recipe: Seq Scan',
+            'users_follow: no index condition on user_id',
+            'food_ingredient: not in plan',
+        ])
+
+
+class HotQueriesTest(TestCase):
+    """Горячие запросы собираются на любой базе."""
+
+    def test_hot_queries_compile(self):
+        seed()
+        for name, (queryset, expected) in get_hot_queries(
+                *get_sample_objects()).items():
+            with self.subTest(name=name):
+                self.assertTrue(str(queryset.query))
+                self.assertTrue(expected)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'EXPLAIN PostgreSQL')
+class QueryPlansTest(TestCase):
+    """Горячие запросы читают таблицы по индексам."""
+
+    def test_hot_queries_use_indexes(self):
+        seed()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        call_command('check_query_plans', '--no-seqscan', stdout=StringIO())
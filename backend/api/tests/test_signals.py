@@ -0,0 +1,63 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from food.models import ChangeLog, Ingredient, IngredientRecipe, Recipe, Tag
+
+User = get_user_model()
+
+
+class RecipeFragmentSourceTest(TestCase):
+    """Фрагменты рецептов сбрасываются только при изменении их данных."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', first_name='user',
+            last_name='user', password='password')
+        self.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        self.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г')
+        self.recipe = Recipe.objects.create(
+            name='Рецепт', text='Текст', cooking_time=1, author=self.user,
+            image='recipes/images/recipe.png')
+        self.recipe.tags.set((self.tag,))
+        IngredientRecipe.objects.create(
+            recipe=self.recipe, ingredient=self.ingredient, amount=1)
+        self.recipe.refresh_from_db()
+        ChangeLog.objects.all().delete()
+
+    def assertRecipeChanged(self, changed):
+        updated_at = self.recipe.updated_at
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.updated_at != updated_at, changed)
+        self.assertEqual(
+            ChangeLog.objects.filter(
+                kind=ChangeLog.RECIPE, action=ChangeLog.UPDATED,
+                object_id=self.recipe.id
+            ).exists(),
+            changed
+        )
+
+    def test_unchanged_saves_keep_fragments(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('new-password')
+        user.save()
+        user.is_staff = True
+        user.save()
+        Tag.objects.get(pk=self.tag.pk).save()
+        Ingredient.objects.get(pk=self.ingredient.pk).save()
+        self.assertRecipeChanged(False)
+
+    def test_author_change_updates_recipes(self):
+        self.user.first_name = 'new'
+        self.user.save()
+        self.assertRecipeChanged(True)
+
+    def test_tag_change_updates_recipes(self):
+        self.tag.name = 'Обед'
+        self.tag.save(update_fields=('name',))
+        self.assertRecipeChanged(True)
+
+    def test_ingredient_change_updates_recipes(self):
+        self.ingredient.measurement_unit = 'кг'
+        self.ingredient.save()
+        self.assertRecipeChanged(True)
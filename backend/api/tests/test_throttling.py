@@ -0,0 +1,107 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.throttling import AnonReadThrottle
+
+
+def slow(method):
+    def wrapper(*args, **kwargs):
+        time.sleep(0.001)
+        return method(*args, **kwargs)
+    return wrapper
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlidingWindowThrottleTest(SimpleTestCase):
+    """Окно пропускает не больше заданной частоты при любой нагрузке."""
+
+    def setUp(self):
+        cache.clear()
+        self.clock = FakeClock()
+        # Часы подменяются и для срока жизни значений в кэше.
+        patcher = mock.patch('time.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_throttle(self):
+        throttle = AnonReadThrottle()
+        throttle.rate = '60/min'
+        throttle.num_requests, throttle.duration = throttle.parse_rate(
+            throttle.rate)
+        throttle.timer = self.clock
+        return throttle
+
+    def send(self):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        throttle = self.make_throttle()
+        return throttle.allow_request(request, None), throttle
+
+    def test_sustained_rate(self):
+        allowed_at = []
+        for _ in range(10 * 60 * 10):
+            if self.send()[0]:
+                allowed_at.append(self.clock.now)
+            self.clock.now += 0.1
+        # Не больше лимита за любые 60 секунд, а всего - не меньше
+        # лимита за 55 секунд: окно учитывает лишний отрезок в 6 секунд.
+        for start in range(0, len(allowed_at), 7):
+            window = [
+                moment for moment in allowed_at[start:]
+                if moment < allowed_at[start] + 60
+            ]
+            self.assertLessEqual(len(window), 60)
+        self.assertGreaterEqual(len(allowed_at), 10 * 60 * 55 // 60)
+
+    def test_burst_and_retry_after(self):
+        results = [self.send()[0] for _ in range(60)]
+        self.assertTrue(all(results))
+        allowed, throttle = self.send()
+        self.assertFalse(allowed)
+        self.clock.now += throttle.wait() - 0.5
+        self.assertFalse(self.send()[0])
+        self.clock.now += 0.5
+        self.assertTrue(self.send()[0])
+
+    def test_idle_client_gets_limit_only(self):
+        self.send()
+        self.clock.now += 3600
+        results = [self.send()[0] for _ in range(61)]
+        self.assertEqual(results.count(True), 60)
+
+    def test_concurrent_requests_share_limit(self):
+        # Пауза перед каждой операцией с кэшем, чтобы запросы потоков
+        # перемежались между чтением и записью счётчиков.
+        for name in ('get', 'get_many', 'set', 'add', 'incr', 'decr'):
+            patcher = mock.patch.object(
+                LocMemCache, name, slow(getattr(LocMemCache, name)))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        barrier = threading.Barrier(8)
+        results = []
+
+        def send():
+            barrier.wait()
+            for _ in range(20):
+                results.append(self.send()[0])
+
+        threads = [threading.Thread(target=send) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 60)
@@ -0,0 +1,108 @@
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+from .constants import THROTTLE_WINDOW_BUCKETS
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    Ограничение частоты запросов скользящим окном.
+    Окно duration делится на THROTTLE_WINDOW_BUCKETS отрезков,
+    запросы каждого отрезка считаются в кэше атомарными add и incr,
+    поэтому одновременные запросы в разных воркерах не проходят
+    сверх лимита. Учитывается и отрезок, который лишь частично
+    попадает в последние duration секунд, так что лимит соблюдается
+    для любого интервала такой длины. Отклонённый запрос вычитается
+    из счётчика.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.now = self.timer()
+        self.bucket_size = self.duration / THROTTLE_WINDOW_BUCKETS
+        bucket = int(self.now // self.bucket_size)
+        key = f'{self.key}:{bucket}'
+        self.cache.add(key, 0, self.duration * 2)
+        current = self.cache.incr(key)
+        keys = [
+            f'{self.key}:{number}'
+            for number in range(bucket - THROTTLE_WINDOW_BUCKETS, bucket)
+        ]
+        cached = self.cache.get_many(keys)
+        counts = [cached.get(key, 0) for key in keys]
+        count = sum(counts) + current
+        if count > self.num_requests:
+            self.cache.decr(key)
+            self.remaining = 0
+            self.wait_time = self.get_wait_time(
+                bucket, counts + [current - 1], count - self.num_requests)
+            return self.throttle_failure()
+        self.remaining = self.num_requests - count
+        return self.throttle_success()
+
+    def get_wait_time(self, bucket, counts, excess):
+        """
+        Секунды до выхода из окна стольких старых запросов, чтобы
+        следующий уложился в лимит. counts - счётчики отрезков окна
+        от старого к текущему.
+        """
+        dropped = 0
+        for offset, bucket_count in enumerate(counts):
+            dropped += bucket_count
+            if dropped >= excess:
+                break
+        return (bucket + offset + 1) * self.bucket_size - self.now
+
+    def throttle_success(self):
+        self.set_rate_limit_headers()
+        return True
+
+    def throttle_failure(self):
+        self.set_rate_limit_headers()
+        return False
+
+    def set_rate_limit_headers(self):
+        # Заголовки добавляет RateLimitHeadersMiddleware.
+        self.request._request.rate_limit = (
+            self.num_requests, self.remaining)
+
+    def get_cache_key(self, request, view):
+        self.request = request
+        if not self.is_throttled(request):
+            return None
+        ident = (request.user.pk if request.user.is_authenticated
+                 else self.get_ident(request))
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def is_throttled(self, request):
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class AnonReadThrottle(SlidingWindowThrottle):
+    """Чтение анонимными пользователями."""
+    scope = 'anon_read'
+
+    def is_throttled(self, request):
+        return (request.method in SAFE_METHODS
+                and not request.user.is_authenticated)
+
+
+class UserWriteThrottle(SlidingWindowThrottle):
+    """Изменения данных пользователями: рецепты, аватар, подписки."""
+    scope = 'user_write'
+
+    def is_throttled(self, request):
+        return (request.method not in SAFE_METHODS
+                and request.user.is_authenticated)
+
+
+class ShortLinkThrottle(SlidingWindowThrottle):
+    """Переходы по коротким ссылкам."""
+    scope = 'short_link'
@@ -12,8 +12,10 @@ router_v1.register(
 router_v1.register('tags', views.TagViewSet, basename='tags')
 router_v1.register('recipes', views.RecipeViewSet, basename='recipes')
 router_v1.register('users', views.CustomUserViewSet, basename='users')
+router_v1.register('changes', views.ChangesViewSet, basename='changes')
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('batch/', views.BatchView.as_view(), name='batch'),
     path('', include(router_v1.urls))
 ]
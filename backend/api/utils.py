@@ -1,13 +1,25 @@
 import base64
 import hashlib
+import json
+from io import BytesIO
+from urllib.parse import urlsplit
 
+from django.core.cache import cache
 from django.core.files.base import ContentFile
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.db.models import QuerySet
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from rest_framework import serializers, status
 from rest_framework.response import Response
 
-from .constants import MAX_HASH
-from food.models import IngredientRecipe, Recipe
+from .constants import (EXPAND_PARAM, FIELDS_PARAM, MAX_HASH, OMIT_PARAM,
+                        RECIPE_FRAGMENT_CACHE_KEY, TAG_MAP_CACHE_KEY,
+                        TAG_MAP_CACHE_TIMEOUT)
+from food.matching import invalidate_ingredient_index
+from food.models import ChangeLog, IngredientRecipe, Recipe, Tag
+from food.utils import chunked, iterate_in_chunks
 
 
 class Base64ImageField(serializers.ImageField):
@@ -33,8 +45,10 @@ def add_ingredients(ingredients, recipe):
         ],
         ignore_conflicts=True
     )
+    invalidate_ingredient_index()
 
 
+@transaction.atomic
 def add_recipe(request, pk, serializer_name):
     """
     Вспомогательная функция для добавления
@@ -50,6 +64,7 @@ def add_recipe(request, pk, serializer_name):
     return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+@transaction.atomic
 def delete_recipe(request, pk, model_name):
     """
     Вспомогательная функция для удаления рецепта
@@ -69,3 +84,114 @@ def generate_short_url(recipe_id):
     """Вспомогательная функция для генерации коротких ссылок"""
     hash_object = hashlib.md5(str(recipe_id).encode())
     return hash_object.hexdigest()[:MAX_HASH]
+
+
+def get_tag_ids_by_slug():
+    """Возвращает закэшированное соответствие слагов тегов их id."""
+    tag_map = cache.get(TAG_MAP_CACHE_KEY)
+    if tag_map is None:
+        tag_map = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(TAG_MAP_CACHE_KEY, tag_map, TAG_MAP_CACHE_TIMEOUT)
+    return tag_map
+
+
+def invalidate_tag_map():
+    """Сбрасывает кэш соответствия слагов тегов их id."""
+    cache.delete(TAG_MAP_CACHE_KEY)
+
+
+def get_recipe_fragment_key(recipe_id, updated_at):
+    """
+    Ключ кэша с независимой от пользователя частью рецепта.
+    Версией служит дата изменения рецепта, поэтому фрагмент,
+    прочитанный до фиксации изменения или с отстающей реплики,
+    не попадает под ключ новой версии.
+    """
+    return RECIPE_FRAGMENT_CACHE_KEY.format(recipe_id, updated_at.timestamp())
+
+
+def invalidate_recipe_fragments(recipe_ids, log_changes=False):
+    """
+    Сдвигает дату изменения рецептов, а с ней и версию их фрагментов.
+    Выполняется в транзакции изменения, поэтому новая версия
+    становится видна вместе с новыми данными. Для изменений без
+    сохранения самого рецепта (автор, тег, ингредиент) log_changes
+    добавляет записи в журнал изменений: UPDATE идёт без сигналов.
+    """
+    if isinstance(recipe_ids, QuerySet):
+        recipe_ids = iterate_in_chunks(recipe_ids)
+    now = timezone.now()
+    for ids in chunked(recipe_ids):
+        Recipe.all_objects.filter(id__in=ids).update(updated_at=now)
+        if log_changes:
+            ChangeLog.objects.bulk_create(
+                ChangeLog(kind=ChangeLog.RECIPE, action=ChangeLog.UPDATED,
+                          object_id=recipe_id)
+                for recipe_id in ids
+            )
+
+
+def split_param(query_params, name):
+    """Значения параметра запроса, перечисленные через запятую."""
+    return {
+        value.strip()
+        for value in query_params.get(name, '').split(',')
+        if value.strip()
+    }
+
+
+def get_sparse_fieldset(query_params, field_names):
+    """
+    Набор полей, запрошенных параметрами fields и omit,
+    или None, если нужен полный ответ.
+    """
+    if FIELDS_PARAM not in query_params and OMIT_PARAM not in query_params:
+        return None
+    fields = set(field_names)
+    if FIELDS_PARAM in query_params:
+        fields &= split_param(query_params, FIELDS_PARAM)
+    return fields - split_param(query_params, OMIT_PARAM)
+
+
+def get_collapsed_fieldset(query_params, field_names):
+    """
+    Вложенные объекты, которые нужно заменить на id: при явном
+    списке fields раскрываются только перечисленные в expand.
+    """
+    if FIELDS_PARAM not in query_params:
+        return set()
+    return set(field_names) - split_param(query_params, EXPAND_PARAM)
+
+
+def build_sub_request(request, method, url, body=None):
+    """
+    Запрос из пакета: наследует заголовки исходного запроса
+    и уже проверенного пользователя, чтобы не аутентифицировать
+    его повторно. Анонимный запрос проходит обычную проверку,
+    чтобы коды ошибок совпадали с отдельными запросами.
+    """
+    parts = urlsplit(url)
+    payload = b'' if body is None else json.dumps(body).encode()
+    environ = dict(request.META)
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': BytesIO(payload),
+    })
+    sub_request = WSGIRequest(environ)
+    if request.user.is_authenticated:
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def get_response_body(response):
+    """Тело ответа для пакета: данные DRF или текст."""
+    if hasattr(response, 'data'):
+        return response.data
+    if response.streaming:
+        return b''.join(response.streaming_content).decode()
+    return response.content.decode()
@@ -1,38 +1,66 @@
+from datetime import timedelta
 from urllib.parse import urljoin
 
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.shortcuts import HttpResponse, get_object_or_404, redirect
+from django.db import transaction
+from django.db.models import Max, Min, Prefetch, Q, Sum
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import Resolver404, resolve
+from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import filters, permissions, status, viewsets
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, throttle_classes
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
-from .filters import IngredientFilter, RecipeFilter
+from .builders import (INGREDIENT_ROW, RECIPE_ROW, RECIPE_SMALL_ROW,
+                       build_recipe_list)
+from .coalescing import coalesce
+from .constants import (BATCH_MAX_REQUESTS, CHANGES_CURSOR_PARAM,
+                        CHANGES_LIMIT, CHANGES_SETTLE_SECONDS, FACETS_PARAM,
+                        MATCH_INGREDIENTS_PARAM, MATCH_MAX_LIMIT,
+                        RECIPE_QUERY_PARAM, RECIPES_LIMIT)
+from .filters import (IngredientFilter, RecipeFilter, get_cooking_time_facet,
+                      get_tag_facet)
+from .mixins import ReplicaReadMixin
 from .pagination import RecipePagination
 from .permissions import RecipePermission
-from .serializers import (CustomUserSerializer, FavoriteSerializer,
-                          FollowSerializer, IngredientSerializer,
-                          RecipeListSerializer, RecipeShortLinkSerializer,
-                          RecipeWriteSerializer, ShoppingCartSerializer,
-                          SubscriptionsSerializer, TagSerializer,
-                          UserAvatarSerializer)
-from .utils import add_recipe, delete_recipe, generate_short_url
-from food.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                         ShoppingCart, Tag)
+from .serializers import (BatchRequestSerializer, CustomUserSerializer,
+                          FavoriteSerializer, FollowSerializer,
+                          IngredientSerializer, RecipeListSerializer,
+                          RecipeShortLinkSerializer, RecipeWriteSerializer,
+                          ShoppingCartSerializer, SubscriptionsSerializer,
+                          TagSerializer, UserAvatarSerializer)
+from .throttling import ShortLinkThrottle
+from .utils import (add_recipe, build_sub_request, delete_recipe,
+                    generate_short_url, get_collapsed_fieldset,
+                    get_response_body, get_sparse_fieldset)
+from food.constants import RECIPE_INGREDIENTS_ORDERING, RECIPE_TAGS_ORDERING
+from food.counters import view_counter
+from food.deletion import mark_recipe_deleted, mark_user_deleted
+from food.matching import get_ingredient_index
+from food.models import (ChangeLog, Favorite, Ingredient, IngredientRecipe,
+                         Recipe, ShoppingCart, Tag)
+from food.units import canonical_amount, canonical_unit, format_amount
+from food.utils import iterate_in_chunks
 from users.models import Follow
 
 User = get_user_model()
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ReplicaReadMixin, UserViewSet):
     queryset = User.objects.all()
+    replica_actions = ('list',)
     pagination_class = RecipePagination
     permission_classes = (permissions.AllowAny,)
     filter_backends = (filters.SearchFilter,)
     search_fields = ('username',)
 
+    def perform_destroy(self, instance):
+        mark_user_deleted(instance)
+
     @action(
         detail=False,
         methods=('GET',),
@@ -51,8 +79,8 @@ class CustomUserViewSet(UserViewSet):
     def user_avatar(self, request):
         """Добавляет или меняет аватар пользователя."""
         user = self.request.user
-        if request.user.avatar:
-            request.user.avatar.delete()
+        if user.avatar:
+            user.avatar.delete(save=False)
         serializer = UserAvatarSerializer(
             user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
@@ -64,7 +92,8 @@ class CustomUserViewSet(UserViewSet):
         """Удаляет аватар пользователя."""
         user = request.user
         if user.avatar:
-            user.avatar.delete()
+            user.avatar.delete(save=False)
+            user.save(update_fields=('avatar',))
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -73,9 +102,10 @@ class CustomUserViewSet(UserViewSet):
         detail=True,
         url_path='subscribe'
     )
+    @transaction.atomic
     def subscribe(self, request, id):
         """Создание подписки на пользователя."""
-        following = get_object_or_404(User, pk=id)
+        following = get_object_or_404(User.objects, pk=id)
         serializer = FollowSerializer(
             data={'user': request.user.id, 'following': following.id},
             context={'request': request}
@@ -85,9 +115,10 @@ class CustomUserViewSet(UserViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
+    @transaction.atomic
     def delete_subscribe(self, request, id):
         """Удаление подписки на пользователя."""
-        following = get_object_or_404(User, pk=id)
+        following = get_object_or_404(User.objects, pk=id)
         if not following.following.filter(user=request.user).exists():
             return Response(
                 {'errors': 'Вы не подписаны на этого пользователя'},
@@ -118,22 +149,26 @@ class CustomUserViewSet(UserViewSet):
         return Response(serializer.data)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для ингредиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (IngredientFilter,)
     search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        return Response(INGREDIENT_ROW.build(
+            self.filter_queryset(self.get_queryset())))
+
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тегов."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """Вьюсет для рецептов."""
     queryset = Recipe.objects.all()
     pagination_class = RecipePagination
@@ -142,11 +177,90 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
     http_method_names = ('get', 'post', 'patch', 'delete')
 
+    def get_queryset(self):
+        """
+        При запросе части полей загружает только нужные связи:
+        полный ответ собирается из кэша фрагментов без них.
+        """
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+        query_params = self.request.query_params
+        fields = get_sparse_fieldset(
+            query_params, RecipeListSerializer.Meta.fields)
+        if fields is None:
+            return queryset
+        collapsed = get_collapsed_fieldset(
+            query_params, RecipeListSerializer.collapsed_fields)
+        if 'author' in fields and 'author' not in collapsed:
+            queryset = queryset.select_related('author')
+        if 'tags' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'tags', Tag.objects.order_by(*RECIPE_TAGS_ORDERING)))
+        if 'ingredients' in fields:
+            queryset = queryset.prefetch_related(Prefetch(
+                'recipe_ingredients',
+                IngredientRecipe.objects.select_related(
+                    'ingredient').order_by(*RECIPE_INGREDIENTS_ORDERING)))
+        if 'text' not in fields:
+            queryset = queryset.defer('text')
+        return queryset
+
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return RecipeListSerializer
         return RecipeWriteSerializer
 
+    def perform_destroy(self, instance):
+        mark_recipe_deleted(instance)
+
+    def list(self, request, *args, **kwargs):
+        if get_sparse_fieldset(
+                request.query_params,
+                RecipeListSerializer.Meta.fields) is None:
+            response = self.list_rows(request)
+        else:
+            response = super().list(request, *args, **kwargs)
+        if request.query_params.get(FACETS_PARAM) in ('1', 'true'):
+            response.data['facets'] = {
+                'tags': get_tag_facet(self.get_facet_queryset(
+                    ('tags', 'tags_mode'))),
+                'cooking_time': get_cooking_time_facet(
+                    self.get_facet_queryset(
+                        ('cooking_time_min', 'cooking_time_max'))),
+            }
+        return response
+
+    def list_rows(self, request):
+        """
+        Полный ответ списка из values_list, без моделей и полей DRF.
+        Совпадает с ответом RecipeListSerializer побайтно.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).values_list(
+            *RECIPE_ROW.columns)
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(build_recipe_list(queryset, request))
+        return self.get_paginated_response(build_recipe_list(page, request))
+
+    def get_facet_queryset(self, exclude):
+        """
+        Выборка с текущими фильтрами, кроме фильтров самого фасета:
+        иначе выбранный тег обнулял бы счётчики остальных.
+        """
+        data = self.request.query_params.copy()
+        for name in exclude:
+            data.pop(name, None)
+        return self.filterset_class(
+            data, Recipe.objects.all(), request=self.request).qs
+
+    def retrieve(self, request, *args, **kwargs):
+        retrieve = super().retrieve
+        data = coalesce(
+            request, lambda: retrieve(request, *args, **kwargs).data)
+        view_counter.increment(int(self.kwargs['pk']))
+        return Response(data)
+
     @action(
         methods=('GET',),
         permission_classes=(permissions.IsAuthenticated,),
@@ -156,21 +270,87 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         """Отправка файла со списком покупок."""
         ingredients = IngredientRecipe.objects.filter(
-            recipe__shoppingcart__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(ingredient_amount=Sum('amount'))
-        shopping_list = ['Список покупок:\n']
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['ingredient_amount']
-            shopping_list.append(f'\n{name} - {amount}, {unit}')
-        response = HttpResponse(shopping_list, content_type='text/plain')
+            recipe__shoppingcart__user=request.user,
+            recipe__deleted_at__isnull=True
+        ).values('ingredient__name').annotate(
+            unit=canonical_unit('ingredient__measurement_unit')
+        ).values('ingredient__name', 'unit').annotate(
+            ingredient_amount=Sum(canonical_amount(
+                'amount', 'ingredient__measurement_unit'))
+        ).order_by('ingredient__name')
+
+        def shopping_list():
+            yield 'Список покупок:\n'
+            for ingredient in iterate_in_chunks(ingredients):
+                name = ingredient['ingredient__name']
+                amount, unit = format_amount(
+                    ingredient['ingredient_amount'], ingredient['unit'])
+                yield f'\n{name} - {amount}, {unit}'
+
+        response = StreamingHttpResponse(
+            shopping_list(), content_type='text/plain')
         response['Content-Disposition'] = (
             'attachment; filename="shopping_list.txt"')
         return response
 
+    @action(
+        methods=('GET',),
+        detail=False,
+        url_path='match'
+    )
+    def match(self, request):
+        """
+        Подбор рецептов по имеющимся ингредиентам. Рецепты упорядочены
+        по доле своих ингредиентов, найденных среди переданных.
+        """
+        try:
+            ingredient_ids = [
+                int(value) for value
+                in request.query_params.getlist(MATCH_INGREDIENTS_PARAM)
+            ]
+            limit = int(
+                request.query_params.get(RECIPE_QUERY_PARAM, RECIPES_LIMIT))
+        except ValueError:
+            return Response(
+                {'errors': 'Параметры должны быть целыми числами'},
+                status=status.HTTP_400_BAD_REQUEST)
+        if not ingredient_ids:
+            return Response(
+                {'errors': 'Укажите хотя бы один ингредиент'},
+                status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, MATCH_MAX_LIMIT))
+        # Индекс перестраивается с задержкой и может ещё содержать
+        # удалённые рецепты, поэтому кандидатов берётся с запасом.
+        matches = get_ingredient_index().match(ingredient_ids, limit * 2)
+        recipes = Recipe.objects.in_bulk(
+            [recipe_id for recipe_id, _ in matches])
+        data = []
+        for recipe_id, coverage in matches:
+            if recipe_id not in recipes:
+                continue
+            if len(data) == limit:
+                break
+            recipe = RecipeListSerializer(
+                recipes[recipe_id], context={'request': request}).data
+            recipe['coverage'] = round(coverage, 4)
+            data.append(recipe)
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(
+        methods=('GET',),
+        detail=True,
+        url_path='similar'
+    )
+    def similar(self, request, pk):
+        """Похожие рецепты по ингредиентам и тегам."""
+        recipe = get_object_or_404(Recipe, id=pk)
+        recipes = Recipe.objects.filter(
+            neighbor_of__recipe=recipe
+        ).order_by('-neighbor_of__score')
+        return Response(
+            RECIPE_SMALL_ROW.build(recipes, request=request),
+            status=status.HTTP_200_OK)
+
     @action(
         methods=('POST',),
         permission_classes=(permissions.IsAuthenticated,),
@@ -220,9 +400,110 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class ChangesViewSet(viewsets.ViewSet):
+    """
+    Изменения для синхронизации клиентов. Без параметра since
+    возвращает только текущий курсор: клиент загружает данные целиком
+    и дальше запрашивает изменения после этого курсора.
+    """
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def list(self, request):
+        changes = ChangeLog.objects.filter(
+            Q(user__isnull=True) | Q(user=request.user)
+        )
+        # Свежие записи пропускаем: транзакции с меньшими id
+        # могут быть ещё не зафиксированы.
+        settled = timezone.now() - timedelta(seconds=CHANGES_SETTLE_SECONDS)
+        since = request.query_params.get(CHANGES_CURSOR_PARAM)
+        if since is None:
+            cursor = ChangeLog.objects.filter(
+                created__lte=settled).aggregate(cursor=Max('id'))['cursor']
+            return Response({'cursor': cursor or 0})
+        try:
+            since = int(since)
+        except ValueError:
+            return Response(
+                {'errors': 'Курсор должен быть целым числом'},
+                status=status.HTTP_400_BAD_REQUEST)
+        oldest = ChangeLog.objects.aggregate(oldest=Min('id'))['oldest']
+        if oldest is not None and since < oldest - 1:
+            return Response(
+                {'errors': 'Курсор устарел, нужна полная синхронизация'},
+                status=status.HTTP_410_GONE)
+        entries = list(
+            changes.filter(id__gt=since, created__lte=settled)
+            .order_by('id')
+            .values_list('id', 'kind', 'action', 'object_id')
+            [:CHANGES_LIMIT + 1]
+        )
+        has_more = len(entries) > CHANGES_LIMIT
+        entries = entries[:CHANGES_LIMIT]
+        states = {}
+        for _, kind, change, object_id in entries:
+            previous = states.get((kind, object_id))
+            if previous == ChangeLog.CREATED and change == ChangeLog.UPDATED:
+                continue
+            states[(kind, object_id)] = change
+        data = {
+            kind: {change: [] for change, _ in ChangeLog.ACTIONS}
+            for kind, _ in ChangeLog.KINDS
+        }
+        for (kind, object_id), change in states.items():
+            data[kind][change].append(object_id)
+        data['cursor'] = entries[-1][0] if entries else since
+        data['has_more'] = has_more
+        return Response(data)
+
+
+class BatchView(APIView):
+    """
+    Выполняет несколько запросов к API за один вызов. Запросы
+    обрабатываются по порядку в этом же процессе теми же вьюсетами,
+    каждый со своими правами и ограничением частоты.
+    """
+    permission_classes = (permissions.AllowAny,)
+    throttle_classes = ()
+
+    def post(self, request):
+        serializer = BatchRequestSerializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        if len(serializer.validated_data) > BATCH_MAX_REQUESTS:
+            return Response(
+                {'errors': f'Не больше {BATCH_MAX_REQUESTS} запросов'},
+                status=status.HTTP_400_BAD_REQUEST)
+        return Response([
+            self.perform_sub_request(request, **sub_request)
+            for sub_request in serializer.validated_data
+        ])
+
+    def perform_sub_request(self, request, method, url, body=None):
+        sub_request = build_sub_request(request, method, url, body)
+        try:
+            match = resolve(sub_request.path_info)
+        except Resolver404:
+            return {
+                'status': status.HTTP_404_NOT_FOUND,
+                'body': {'errors': 'Адрес не найден'},
+            }
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        return {
+            'status': response.status_code,
+            'headers': {
+                header: value for header, value in response.items()
+                if header != 'Content-Type'
+            },
+            'body': get_response_body(response),
+        }
+
+
+@api_view(('GET',))
+@throttle_classes((ShortLinkThrottle,))
 def redirect_to_original(request, short_code):
     """Перенаправление с короткой ссылки на обычную."""
-    recipe = get_object_or_404(Recipe, short_url=short_code)
+    recipe_id = coalesce(request, lambda: get_object_or_404(
+        Recipe.objects.only('id'), short_url=short_code).id)
+    view_counter.increment(recipe_id)
     host = request.get_host()
-    url = urljoin(f'http://{host}/api/', f'recipes/{recipe.id}/')
+    url = urljoin(f'http://{host}/api/', f'recipes/{recipe_id}/')
     return redirect(url)
@@ -1,20 +1,126 @@
+import csv
+
 from django.contrib import admin
-from django.db.models import Count
+from django.http import HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
 
+from .deletion import mark_recipe_deleted
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                     ShoppingCart, Tag)
+                     RequestProfile, ShoppingCart, Tag)
+from .pagination import EstimatedCountPaginator
+from .utils import count_subquery, iterate_in_chunks
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+@admin.action(description='Выгрузить в CSV', permissions=('export',))
+def export_as_csv(modeladmin, request, queryset):
+    """Потоковая выгрузка полей export_fields выбранных объектов в CSV."""
+    fields = modeladmin.export_fields
+    writer = csv.writer(Echo())
+
+    def rows():
+        yield writer.writerow(fields)
+        for row in iterate_in_chunks(queryset.values_list(*fields)):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(rows(), content_type='text/csv')
+    response['Content-Disposition'] = (
+        f'attachment; filename="{modeladmin.model._meta.model_name}.csv"')
+    return response
+
+
+class ExportCsvMixin:
+    """
+    Действие выгрузки в CSV. Выгружаются только поля из export_fields,
+    действие доступно сотрудникам с правом изменения объектов.
+    """
+    actions = (export_as_csv,)
+    export_fields = ()
+
+    def has_export_permission(self, request):
+        return self.has_change_permission(request)
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр с полем ввода вместо списка всех значений."""
+    template = 'admin/input_filter.html'
+
+    def lookups(self, request, model_admin):
+        # Без вариантов фильтр не отображается.
+        return ((),)
+
+    def choices(self, changelist):
+        all_choice = next(super().choices(changelist))
+        all_choice['query_parts'] = (
+            (key, value)
+            for key, value in changelist.get_filters_params().items()
+            if key != self.parameter_name
+        )
+        yield all_choice
+
+
+class AuthorFilter(InputFilter):
+    title = 'Автор рецепта'
+    parameter_name = 'author_username'
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(author__username=self.value())
+        return queryset
+
+
+class BaseAdmin(admin.ModelAdmin):
+    """Базовая админка для больших таблиц."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class SoftDeleteAdminMixin:
+    """
+    Удаление в админке только помечает объекты, строки удаляет
+    команда purge_deleted. Связанные объекты на странице
+    подтверждения не собираются: их может быть слишком много.
+    """
+    mark_deleted = None
+
+    def get_deleted_objects(self, objs, request):
+        to_delete = [str(obj) for obj in objs]
+        perms_needed = (
+            set() if self.has_delete_permission(request)
+            else {self.model._meta.verbose_name}
+        )
+        return (to_delete,
+                {self.model._meta.verbose_name_plural: len(to_delete)},
+                perms_needed, [])
+
+    def delete_model(self, request, obj):
+        self.mark_deleted(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset.iterator():
+            self.mark_deleted(obj)
 
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(ExportCsvMixin, BaseAdmin):
     list_display = ('name', 'measurement_unit')
+    export_fields = ('id', 'name', 'measurement_unit')
     empty_value_display = 'Не заполнено'
     search_fields = ('name',)
 
 
 @admin.register(Tag)
-class TagAdmin(admin.ModelAdmin):
+class TagAdmin(ExportCsvMixin, BaseAdmin):
     list_display = ('id', 'name', 'slug')
+    export_fields = ('id', 'name', 'slug')
     empty_value_display = 'Не заполнено'
     search_fields = ('name', 'slug')
 
@@ -25,38 +131,98 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author', 'cooking_time', 'favorited_count')
+class RecipeAdmin(SoftDeleteAdminMixin, ExportCsvMixin, BaseAdmin):
+    mark_deleted = staticmethod(mark_recipe_deleted)
+    list_display = ('id', 'name', 'author', 'cooking_time', 'views',
+                    'favorited_count')
+    export_fields = ('id', 'name', 'author_id', 'cooking_time', 'views',
+                     'updated_at')
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username')
-    list_filter = ('tags', 'author')
-    raw_id_fields = ('author',)
+    list_filter = ('tags', AuthorFilter)
+    autocomplete_fields = ('author',)
     filter_horizontal = ('tags',)
 
     def get_queryset(self, request):
         return super().get_queryset(request).annotate(
-            favorited_count=Count('favorite'))
+            favorited_count=count_subquery(Favorite.objects, 'recipe'))
 
-    @admin.display(description='Сколько раз добавлен в избранное')
+    @admin.display(description='Сколько раз добавлен в избранное',
+                   ordering='favorited_count')
     def favorited_count(self, request):
         return request.favorited_count
 
 
 @admin.register(IngredientRecipe)
-class IngredientRecipeAdmin(admin.ModelAdmin):
+class IngredientRecipeAdmin(ExportCsvMixin, BaseAdmin):
     list_display = ('id', 'recipe', 'ingredient', 'amount')
+    export_fields = ('id', 'recipe_id', 'ingredient_id', 'amount')
+    list_select_related = ('recipe', 'ingredient')
     search_fields = ('recipe__name', 'ingredient__name')
+    autocomplete_fields = ('recipe', 'ingredient')
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(ExportCsvMixin, BaseAdmin):
     list_display = ('id', 'recipe', 'user')
+    export_fields = ('id', 'recipe_id', 'user_id', 'created')
+    list_select_related = ('recipe', 'user')
     search_fields = ('recipe__name', 'user__username')
+    autocomplete_fields = ('recipe', 'user')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(ExportCsvMixin, BaseAdmin):
     list_display = ('id', 'recipe', 'user')
+    export_fields = ('id', 'recipe_id', 'user_id', 'created')
+    list_select_related = ('recipe', 'user')
     search_fields = ('recipe__name', 'user__username')
+    autocomplete_fields = ('recipe', 'user')
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(BaseAdmin):
+    list_display = ('id', 'created', 'method', 'path', 'status_code',
+                    'duration', 'sql_count', 'sql_duration', 'user')
+    list_select_related = ('user',)
+    list_filter = ('method', 'status_code')
+    search_fields = ('path', 'user__username')
+    exclude = ('profile',)
+    readonly_fields = ('download_link',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/',
+                self.admin_site.admin_view(self.download_profile),
+                name='food_requestprofile_download',
+            ),
+        ] + super().get_urls()
+
+    @admin.display(description='Файл профиля')
+    def download_link(self, obj):
+        return format_html(
+            '<a href="{}">request-{}.prof</a>',
+            reverse('admin:food_requestprofile_download', args=(obj.pk,)),
+            obj.pk
+        )
+
+    def download_profile(self, request, pk):
+        """Отдаёт профиль в формате pstats, например для snakeviz."""
+        if not self.has_view_permission(request):
+            return HttpResponse(status=403)
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(
+            bytes(profile.profile), content_type='application/octet-stream')
+        response['Content-Disposition'] = (
+            f'attachment; filename="request-{pk}.prof"')
+        return response
 
 
 admin.site.register(Tag.recipes.through)
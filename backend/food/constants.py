@@ -8,3 +8,17 @@ INGREDIENT_MAX_LENGTH = 128
 MAX_MEASURMENT_UNIT = 32
 MIN_COOKING_TIME = 1
 MAX_COOKING_TIME = 10000
+CHUNK_SIZE = 2000
+RECIPE_TAGS_ORDERING = ('id',)
+RECIPE_INGREDIENTS_ORDERING = ('id',)
+ESTIMATED_COUNT_THRESHOLD = 100000
+TRENDING_HALF_LIFE_DAYS = 3
+SCORES_UPDATE_OVERLAP_SECONDS = 60
+INGREDIENT_INDEX_VERSION_KEY = 'food:ingredient_index_version'
+INGREDIENT_INDEX_REBUILD_INTERVAL = 60
+SIMILAR_RECIPES_COUNT = 10
+VIEW_COUNTER_FLUSH_INTERVAL = 5
+CHANGELOG_RETENTION_DAYS = 30
+CHANGELOG_KIND_MAX_LENGTH = 16
+PROFILE_METHOD_MAX_LENGTH = 10
+PURGE_CHUNK_SIZE = 100
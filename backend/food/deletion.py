@@ -0,0 +1,131 @@
+from functools import lru_cache
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .constants import PURGE_CHUNK_SIZE
+from .matching import invalidate_ingredient_index
+from .models import ChangeLog, Recipe
+from .utils import chunked
+from users.models import Follow
+
+
+def mark_recipe_deleted(recipe):
+    """Скрывает рецепт; журнал изменений пишет сигнал post_save."""
+    recipe.deleted_at = timezone.now()
+    recipe.save(update_fields=('deleted_at',))
+    transaction.on_commit(invalidate_ingredient_index)
+
+
+@transaction.atomic
+def mark_user_deleted(user):
+    """
+    Деактивирует и скрывает пользователя вместе с его рецептами.
+    Рецепты помечаются одним UPDATE на пачку, без сигналов,
+    поэтому записи журнала изменений создаются здесь же.
+    """
+    now = timezone.now()
+    user.deleted_at = now
+    user.is_active = False
+    user.save(update_fields=('deleted_at', 'is_active'))
+    recipe_ids = Recipe.objects.filter(author=user).values_list(
+        'id', flat=True)
+    for ids in chunked(list(recipe_ids)):
+        Recipe.objects.filter(id__in=ids).update(deleted_at=now)
+        ChangeLog.objects.bulk_create(
+            ChangeLog(kind=ChangeLog.RECIPE, action=ChangeLog.DELETED,
+                      object_id=recipe_id)
+            for recipe_id in ids
+        )
+    transaction.on_commit(invalidate_ingredient_index)
+    follower_ids = Follow.objects.filter(following=user).values_list(
+        'user_id', flat=True)
+    for ids in chunked(follower_ids.iterator()):
+        ChangeLog.objects.bulk_create(
+            ChangeLog(user_id=follower_id, kind=ChangeLog.FOLLOW,
+                      action=ChangeLog.DELETED, object_id=user.id)
+            for follower_id in ids
+        )
+
+
+@lru_cache(maxsize=None)
+def get_reverse_relations(model):
+    """Внешние ключи других моделей, указывающие на model."""
+    return tuple(
+        (relation.related_model, relation.field)
+        for relation in model._meta.get_fields(include_hidden=True)
+        if relation.auto_created and not relation.concrete
+        and (relation.one_to_many or relation.one_to_one)
+    )
+
+
+def raw_delete(model, ids):
+    """DELETE по первичному ключу без сборщика Django и сигналов."""
+    quote_name = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote_name(model._meta.db_table)} '
+            f'WHERE {quote_name(model._meta.pk.column)} '
+            f'IN ({placeholders})',
+            ids
+        )
+        return cursor.rowcount
+
+
+def delete_files(storages_and_names):
+    for storage, name in storages_and_names:
+        storage.delete(name)
+
+
+def iterate_id_batches(queryset, size=PURGE_CHUNK_SIZE):
+    """Первичные ключи queryset пачками по size, по возрастанию."""
+    last_id = None
+    while True:
+        batch = queryset if last_id is None else queryset.filter(
+            pk__gt=last_id)
+        ids = list(batch.order_by('pk').values_list('pk', flat=True)[:size])
+        if not ids:
+            return
+        yield ids
+        last_id = ids[-1]
+
+
+def purge_rows(model, ids):
+    """
+    Удаляет строки model и всё, что на них ссылается, не загружая
+    объекты: зависимые строки выбираются по ключу пачками
+    по PURGE_CHUNK_SIZE, каждая пачка удаляется своей короткой
+    транзакцией после своих зависимых строк. Файлы удаляются после
+    фиксации. Возвращает число удалённых строк model.
+    """
+    for related_model, field in get_reverse_relations(model):
+        on_delete = field.remote_field.on_delete
+        if on_delete is models.DO_NOTHING:
+            continue
+        if on_delete not in (models.CASCADE, models.SET_NULL):
+            raise ValueError(f'Unsupported on_delete for {field}')
+        rows = related_model._base_manager.filter(
+            **{f'{field.name}__in': ids})
+        for child_ids in iterate_id_batches(rows):
+            if on_delete is models.SET_NULL:
+                related_model._base_manager.filter(pk__in=child_ids).update(
+                    **{field.name: None})
+            else:
+                purge_rows(related_model, child_ids)
+    file_fields = [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField)
+    ]
+    files = []
+    if file_fields:
+        for names in model._base_manager.filter(pk__in=ids).values_list(
+                *(field.attname for field in file_fields)):
+            files.extend(
+                (field.storage, name)
+                for field, name in zip(file_fields, names) if name
+            )
+    with transaction.atomic():
+        deleted = raw_delete(model, ids)
+        transaction.on_commit(lambda: delete_files(files))
+    return deleted
@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from food.constants import CHANGELOG_RETENTION_DAYS, CHUNK_SIZE
+from food.models import ChangeLog
+
+
+class Command(BaseCommand):
+    """
+    Удаляет записи журнала изменений старше срока хранения.
+    Клиенты с более старым курсором получают 410 и синхронизируются
+    заново. Предназначена для периодического запуска, например из cron.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=CHANGELOG_RETENTION_DAYS,
+            help='Срок хранения записей в днях.'
+        )
+
+    def handle(self, *args, **options):
+        border = timezone.now() - timedelta(days=options['days'])
+        last_id = ChangeLog.objects.filter(created__lt=border).order_by(
+            '-id').values_list('id', flat=True).first()
+        deleted = 0
+        while last_id is not None:
+            # Удаляем короткими пачками, чтобы не держать долгие блокировки.
+            ids = list(ChangeLog.objects.filter(id__lte=last_id).order_by(
+                'id').values_list('id', flat=True)[:CHUNK_SIZE])
+            if not ids:
+                break
+            deleted += ChangeLog.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(
+            self.style.SUCCESS(f'CHANGELOG ENTRIES DELETED: {deleted}')
+        )
@@ -1,9 +1,12 @@
 import json
 import os
 
+from django.conf import settings
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
 
 from food.models import Ingredient
+from food.utils import chunked
 
 JSON_PATH = os.path.join('/app/data')
 MODEL = Ingredient
@@ -18,11 +21,14 @@ class Command(BaseCommand):
         try:
             with open(file_path, 'r', encoding='utf-8') as file:
                 data = json.load(file)
-                objects_to_create = [MODEL(**item) for item in data]
-
-                MODEL.objects.bulk_create(
-                    objects_to_create, ignore_conflicts=True
-                )
+                for items in chunked(data):
+                    MODEL.objects.bulk_create(
+                        [MODEL(**item) for item in items],
+                        ignore_conflicts=True
+                    )
+                # bulk_create не отправляет сигналы, публикуем явно.
+                if settings.CATALOG_SNAPSHOT_ROOT:
+                    call_command('publish_catalog')
 
                 self.stdout.write(
                     self.style.SUCCESS('DATA SUCCESSFULLY LOADED')
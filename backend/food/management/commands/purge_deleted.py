@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from food.constants import PURGE_CHUNK_SIZE
+from food.deletion import purge_rows
+from food.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Окончательно удаляет помеченные на удаление рецепты и пользователей
+    небольшими пачками, вместе со связанными строками и файлами.
+    Предназначена для периодического запуска, например из cron.
+    """
+
+    def purge(self, model):
+        deleted = 0
+        last_id = 0
+        marked = model.all_objects.filter(deleted_at__isnull=False)
+        while True:
+            ids = list(marked.filter(id__gt=last_id).order_by(
+                'id').values_list('id', flat=True)[:PURGE_CHUNK_SIZE])
+            if not ids:
+                return deleted
+            deleted += purge_rows(model, ids)
+            last_id = ids[-1]
+
+    def handle(self, *args, **options):
+        recipes = self.purge(Recipe)
+        users = self.purge(User)
+        self.stdout.write(self.style.SUCCESS(
+            f'PURGED RECIPES: {recipes}, USERS: {users}'))
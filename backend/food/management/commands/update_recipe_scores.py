@@ -0,0 +1,120 @@
+import math
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from food.constants import (SCORES_UPDATE_OVERLAP_SECONDS,
+                            TRENDING_HALF_LIFE_DAYS)
+from food.models import (Favorite, Recipe, RecipeScore, RecipeScoreCursor,
+                         ShoppingCart)
+from food.utils import chunked, iterate_in_chunks
+
+DECAY_RATE = (
+    math.log(2) / timedelta(days=TRENDING_HALF_LIFE_DAYS).total_seconds()
+)
+EVENT_MODELS = (Favorite, ShoppingCart)
+
+
+def log_add_exp(a, b):
+    """Вычисляет log(exp(a) + exp(b)) без переполнения."""
+    if a is None:
+        return b
+    if a < b:
+        a, b = b, a
+    return a + math.log1p(math.exp(b - a))
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает рейтинги рецептов, у которых с прошлого запуска
+    появились или были удалены добавления в избранное и список покупок.
+    Начало последнего успешного запуска хранится в RecipeScoreCursor.
+    Предназначена для периодического запуска, например из cron.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать рейтинги всех рецептов.'
+        )
+
+    def get_recipe_ids(self, full):
+        if full:
+            return Recipe.objects.values_list('id', flat=True)
+        cursor = RecipeScoreCursor.objects.first()
+        if cursor is None:
+            return Recipe.objects.values_list('id', flat=True)
+        since = cursor.started_at - timedelta(
+            seconds=SCORES_UPDATE_OVERLAP_SECONDS)
+        recipe_ids = set(RecipeScore.objects.filter(
+            is_stale=True).values_list('recipe_id', flat=True))
+        for model in EVENT_MODELS:
+            recipe_ids.update(iterate_in_chunks(
+                model.objects.filter(created__gte=since)
+                .values_list('recipe_id', flat=True)
+            ))
+        return sorted(recipe_ids)
+
+    def get_scores(self, recipe_ids):
+        popularity = dict.fromkeys(recipe_ids, 0)
+        trending = dict.fromkeys(recipe_ids)
+        for model in EVENT_MODELS:
+            events = model.objects.filter(recipe_id__in=recipe_ids)
+            for row in events.values('recipe_id').annotate(
+                    count=Count('id')).order_by():
+                popularity[row['recipe_id']] += row['count']
+            for recipe_id, created in iterate_in_chunks(
+                    events.values_list('recipe_id', 'created')):
+                trending[recipe_id] = log_add_exp(
+                    trending[recipe_id], DECAY_RATE * created.timestamp())
+        return [
+            RecipeScore(
+                recipe_id=recipe_id,
+                popularity=popularity[recipe_id],
+                trending=trending[recipe_id] or 0,
+            )
+            for recipe_id in recipe_ids
+        ]
+
+    def save_scores(self, recipe_ids):
+        """
+        Пересчитывает рейтинги под блокировкой их строк. Удаление из
+        избранного или списка покупок помечает рейтинг устаревшим
+        в своей транзакции и ждёт этой блокировки, поэтому пометка
+        ставится после записи и не теряется. Строки обновляются,
+        а не пересоздаются: UPDATE, ждавший удалённую строку,
+        новую не увидит.
+        """
+        existing = set(
+            RecipeScore.objects.select_for_update()
+            .filter(recipe_id__in=recipe_ids)
+            .values_list('recipe_id', flat=True)
+        )
+        scores = self.get_scores(recipe_ids)
+        now = timezone.now()
+        for score in scores:
+            score.updated_at = now
+        RecipeScore.objects.bulk_update(
+            [score for score in scores if score.recipe_id in existing],
+            ('popularity', 'trending', 'is_stale', 'updated_at')
+        )
+        RecipeScore.objects.bulk_create(
+            [score for score in scores if score.recipe_id not in existing],
+            ignore_conflicts=True
+        )
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        updated = 0
+        for recipe_ids in chunked(self.get_recipe_ids(options['full'])):
+            with transaction.atomic():
+                self.save_scores(recipe_ids)
+            updated += len(recipe_ids)
+        RecipeScoreCursor.objects.update_or_create(
+            pk=1, defaults={'started_at': started_at})
+        self.stdout.write(
+            self.style.SUCCESS(f'RECIPE SCORES UPDATED: {updated}')
+        )
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from food.constants import SCORES_UPDATE_OVERLAP_SECONDS, SIMILAR_RECIPES_COUNT
+from food.models import Recipe, SimilarRecipe, SimilarRecipeCursor
+from food.similarity import RecipeFeatures
+from food.utils import chunked, iterate_in_chunks
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает списки похожих рецептов для рецептов, изменённых
+    с прошлого запуска, и для рецептов, в чьих списках они есть.
+    Новые соседи неизменённых рецептов появляются при полном пересчёте.
+    Начало последнего успешного запуска хранится в SimilarRecipeCursor.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Пересчитать похожие рецепты для всех рецептов.'
+        )
+
+    def get_recipe_ids(self, full):
+        cursor = SimilarRecipeCursor.objects.first()
+        recipes = Recipe.objects.values_list('id', flat=True).order_by()
+        if full or cursor is None:
+            return list(iterate_in_chunks(recipes))
+        since = cursor.started_at - timedelta(
+            seconds=SCORES_UPDATE_OVERLAP_SECONDS)
+        changed = set(iterate_in_chunks(recipes.filter(updated_at__gte=since)))
+        for recipe_ids in chunked(sorted(changed)):
+            changed.update(
+                SimilarRecipe.objects.filter(similar_id__in=recipe_ids)
+                .values_list('recipe_id', flat=True)
+            )
+        return sorted(changed)
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        recipe_ids = self.get_recipe_ids(options['full'])
+        features = RecipeFeatures.build() if recipe_ids else None
+        for chunk in chunked(recipe_ids):
+            neighbors = [
+                SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                              score=score)
+                for recipe_id in chunk
+                for similar_id, score in features.neighbors(
+                    recipe_id, SIMILAR_RECIPES_COUNT)
+            ]
+            with transaction.atomic():
+                SimilarRecipe.objects.filter(recipe_id__in=chunk).delete()
+                SimilarRecipe.objects.bulk_create(neighbors)
+        SimilarRecipeCursor.objects.update_or_create(
+            pk=1, defaults={'started_at': started_at})
+        self.stdout.write(
+            self.style.SUCCESS(f'SIMILAR RECIPES UPDATED: {len(recipe_ids)}')
+        )
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import numpy as np
+from django.core.cache import cache
+
+from .constants import (INGREDIENT_INDEX_REBUILD_INTERVAL,
+                        INGREDIENT_INDEX_VERSION_KEY)
+from .models import IngredientRecipe
+from .utils import iterate_in_chunks
+
+
+class IngredientIndex:
+    """
+    Инвертированный индекс: ингредиент -> отсортированный массив id
+    рецептов, в которых он встречается. Хранится в формате CSR:
+    списки рецептов всех ингредиентов лежат подряд в одном массиве.
+    """
+
+    def __init__(self, pairs):
+        """pairs - массив пар (ingredient_id, recipe_id) формы (N, 2)."""
+        order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+        pairs = pairs[order]
+        self.ingredient_ids, starts = np.unique(
+            pairs[:, 0], return_index=True)
+        self.offsets = np.append(starts, len(pairs))
+        self.postings = pairs[:, 1].astype(np.int32)
+        self.recipe_ids, self.recipe_sizes = np.unique(
+            self.postings, return_counts=True)
+
+    @classmethod
+    def build(cls):
+        rows = IngredientRecipe.objects.filter(
+            recipe__deleted_at__isnull=True
+        ).values_list('ingredient_id', 'recipe_id').order_by()
+        pairs = np.fromiter(
+            (value for row in iterate_in_chunks(rows) for value in row),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        return cls(pairs)
+
+    def match(self, ingredient_ids, limit):
+        """
+        Возвращает до limit пар (recipe_id, coverage), где coverage -
+        доля ингредиентов рецепта из переданного набора. Рецепты
+        упорядочены по coverage, затем по числу совпавших ингредиентов
+        и по убыванию id.
+        """
+        query = np.unique(np.asarray(ingredient_ids, dtype=np.int64))
+        positions = np.searchsorted(self.ingredient_ids, query)
+        found = positions < len(self.ingredient_ids)
+        found[found] = self.ingredient_ids[positions[found]] == query[found]
+        positions = positions[found]
+        if not len(positions):
+            return []
+        postings = np.concatenate([
+            self.postings[self.offsets[position]:self.offsets[position + 1]]
+            for position in positions
+        ])
+        candidates, matched = np.unique(postings, return_counts=True)
+        sizes = self.recipe_sizes[
+            np.searchsorted(self.recipe_ids, candidates)]
+        coverage = matched / sizes
+        if len(candidates) > limit:
+            top = np.argpartition(-coverage, limit - 1)[:limit]
+            threshold = coverage[top].min()
+            top = np.flatnonzero(coverage >= threshold)
+        else:
+            top = np.arange(len(candidates))
+        order = np.lexsort(
+            (-candidates[top], -matched[top], -coverage[top]))[:limit]
+        top = top[order]
+        return list(zip(candidates[top].tolist(), coverage[top].tolist()))
+
+
+_index = None
+_index_version = None
+_index_built_at = 0
+_index_lock = threading.Lock()
+
+
+def get_ingredient_index():
+    """
+    Возвращает индекс текущего процесса. После изменения составов
+    рецептов индекс перестраивается не чаще, чем раз в
+    INGREDIENT_INDEX_REBUILD_INTERVAL секунд.
+    """
+    global _index, _index_version, _index_built_at
+    version = cache.get(INGREDIENT_INDEX_VERSION_KEY, 0)
+    if _index is not None and (
+            version == _index_version
+            or time.monotonic() - _index_built_at
+            < INGREDIENT_INDEX_REBUILD_INTERVAL):
+        return _index
+    with _index_lock:
+        if _index is None or version != _index_version:
+            _index = IngredientIndex.build()
+            _index_version = version
+            _index_built_at = time.monotonic()
+    return _index
+
+
+def invalidate_ingredient_index():
+    """Отмечает индекс ингредиентов устаревшим во всех процессах."""
+    try:
+        cache.incr(INGREDIENT_INDEX_VERSION_KEY)
+    except ValueError:
+        cache.set(INGREDIENT_INDEX_VERSION_KEY, 1, None)
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+INGREDIENT_NAME_TRGM_INDEX = 'ingredient_name_upper_trgm_idx'
+
+
+def create_ingredient_name_trgm_index(apps, schema_editor):
+    """
+    GIN-индекс по UPPER(name) для поиска ингредиентов через
+    istartswith/icontains. Доступен только в PostgreSQL.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INGREDIENT_NAME_TRGM_INDEX} '
+        'ON food_ingredient USING gin (UPPER(name) gin_trgm_ops)'
+    )
+
+
+def drop_ingredient_name_trgm_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'DROP INDEX IF EXISTS {INGREDIENT_NAME_TRGM_INDEX}'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0011_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            create_ingredient_name_trgm_index,
+            drop_ingredient_name_trgm_index,
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS recipe_tags_tag_recipe_idx '
+            'ON food_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX IF EXISTS recipe_tags_tag_recipe_idx',
+        ),
+    ]
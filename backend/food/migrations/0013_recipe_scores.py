@@ -0,0 +1,68 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def create_recipe_scores(apps, schema_editor):
+    """Создаёт рейтинги существующих рецептов для первого пересчёта."""
+    Recipe = apps.get_model('food', 'Recipe')
+    RecipeScore = apps.get_model('food', 'RecipeScore')
+    RecipeScore.objects.bulk_create(
+        (
+            RecipeScore(recipe_id=recipe_id, is_stale=True)
+            for recipe_id in Recipe.objects.values_list('id', flat=True)
+            .iterator()
+        ),
+        batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0012_ingredient_name_trgm_recipe_tags_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeScore',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='food.recipe')),
+                ('popularity', models.PositiveIntegerField(default=0, verbose_name='Популярность')),
+                ('trending', models.FloatField(default=0, verbose_name='Актуальность')),
+                ('is_stale', models.BooleanField(default=False, verbose_name='Требует пересчёта')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата пересчёта')),
+            ],
+            options={
+                'verbose_name': 'рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-popularity', '-recipe'], name='recipescore_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['-trending', '-recipe'], name='recipescore_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipescore',
+            index=models.Index(fields=['updated_at'], name='recipescore_updated_at_idx'),
+        ),
+        migrations.RunPython(create_recipe_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0014_similar_recipes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='views',
+            field=models.PositiveIntegerField(default=0, verbose_name='Просмотры'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:18
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('food', '0015_recipe_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('recipe', 'рецепт'), ('favorite', 'избранное'), ('shopping_cart', 'список покупок'), ('follow', 'подписка')], max_length=16, verbose_name='Объект')),
+                ('action', models.CharField(choices=[('created', 'создание'), ('updated', 'изменение'), ('deleted', 'удаление')], max_length=16, verbose_name='Действие')),
+                ('object_id', models.BigIntegerField(verbose_name='id объекта')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата изменения')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='changes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'изменение',
+                'verbose_name_plural': 'Журнал изменений',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['user', 'id'], name='changelog_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('food', '0017_recipe_cooking_time_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('path', models.TextField(verbose_name='Адрес')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('duration', models.FloatField(verbose_name='Время, мс')),
+                ('sql_count', models.PositiveIntegerField(verbose_name='Число SQL-запросов')),
+                ('sql_duration', models.FloatField(verbose_name='Время SQL, мс')),
+                ('stats', models.TextField(verbose_name='Статистика')),
+                ('queries', models.JSONField(default=list, verbose_name='SQL-запросы')),
+                ('profile', models.BinaryField(verbose_name='Профиль cProfile')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата создания')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='request_profiles', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ('-id',),
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+from food.partitioning import rebuild_table
+
+PARTITIONS = 16
+MODELS = ('Favorite', 'ShoppingCart')
+
+
+def partition_tables(apps, schema_editor):
+    """Секционирует избранное и список покупок по хешу user_id."""
+    for name in MODELS:
+        rebuild_table(
+            schema_editor, apps.get_model('food', name), 'user', PARTITIONS)
+
+
+def unpartition_tables(apps, schema_editor):
+    for name in MODELS:
+        rebuild_table(schema_editor, apps.get_model('food', name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0019_recipe_deleted_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
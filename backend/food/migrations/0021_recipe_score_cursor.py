@@ -0,0 +1,28 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0020_partition_favorite_shoppingcart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeScoreCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(verbose_name='Начало пересчёта')),
+            ],
+            options={
+                'verbose_name': 'отметка пересчёта рейтингов',
+                'verbose_name_plural': 'Отметки пересчёта рейтингов',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='recipescore',
+            name='recipescore_updated_at_idx',
+        ),
+    ]
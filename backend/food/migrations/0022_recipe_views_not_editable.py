@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0021_recipe_score_cursor'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='views',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Просмотры'),
+        ),
+    ]
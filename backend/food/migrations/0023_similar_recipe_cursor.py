@@ -0,0 +1,28 @@
+# Generated by Django 3.2.16 on 2026-10-19 11:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food', '0022_recipe_views_not_editable'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarRecipeCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(verbose_name='Начало пересчёта')),
+            ],
+            options={
+                'verbose_name': 'отметка пересчёта похожих рецептов',
+                'verbose_name_plural': 'Отметки пересчёта похожих рецептов',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='similarrecipe',
+            name='similarrecipe_computed_at_idx',
+        ),
+    ]
@@ -2,11 +2,12 @@ from django.contrib.auth import get_user_model
 from django.core import validators
 from django.db import models
 
-from .constants import (INGREDIENT_MAX_LENGTH, MAX_COOKING_TIME,
-                        MAX_MEASURMENT_UNIT, MAX_RECIPE_AMOUNT,
-                        MIN_COOKING_TIME, MIN_RECIPE_AMOUNT,
-                        RECIPE_NAME_MAX_LENGTH, SHORT_URL_MAX_LENGTH,
-                        TAG_MAX_LENGTH)
+from .constants import (CHANGELOG_KIND_MAX_LENGTH, INGREDIENT_MAX_LENGTH,
+                        MAX_COOKING_TIME, MAX_MEASURMENT_UNIT,
+                        MAX_RECIPE_AMOUNT, MIN_COOKING_TIME, MIN_RECIPE_AMOUNT,
+                        PROFILE_METHOD_MAX_LENGTH, RECIPE_INGREDIENTS_ORDERING,
+                        RECIPE_NAME_MAX_LENGTH, RECIPE_TAGS_ORDERING,
+                        SHORT_URL_MAX_LENGTH, TAG_MAX_LENGTH)
 
 User = get_user_model()
 
@@ -54,8 +55,19 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeManager(models.Manager):
+    """Рецепты без помеченных на удаление."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Recipe(models.Model):
-    """Модель рецепта"""
+    """
+    Модель рецепта.
+    Удалённый рецепт сначала только помечается и скрывается
+    менеджером objects, строки удаляет команда purge_deleted.
+    """
     name = models.CharField('Название', max_length=RECIPE_NAME_MAX_LENGTH)
     text = models.TextField('Описание')
     ingredients = models.ManyToManyField(
@@ -102,15 +114,70 @@ class Recipe(models.Model):
         null=True,
         verbose_name='Короткий URL'
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
+    views = models.PositiveIntegerField(
+        'Просмотры', default=0, editable=False)
+    deleted_at = models.DateTimeField(
+        'Дата удаления', null=True, blank=True, db_index=True)
+
+    objects = RecipeManager()
+    all_objects = models.Manager()
 
     class Meta:
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-id',)
+        indexes = (
+            models.Index(
+                fields=('author', '-id'),
+                name='recipe_author_id_idx',
+            ),
+            models.Index(
+                fields=('cooking_time', '-id'),
+                name='recipe_cooking_time_id_idx',
+            ),
+        )
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        При изменении рецепта не перезаписывает views: счётчик
+        пишется только BufferedViewCounter, и значение, загруженное
+        до сохранения, затёрло бы записанные за это время просмотры.
+        """
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.get_deferred_fields()
+                and field.name != 'views'
+            ]
+        super().save(*args, **kwargs)
+
+    def ordered_tags(self):
+        """
+        Теги в порядке RECIPE_TAGS_ORDERING. Загруженные через
+        prefetch_related с тем же порядком отдаются без запроса.
+        """
+        if 'tags' in getattr(self, '_prefetched_objects_cache', {}):
+            return list(self.tags.all())
+        return self.tags.order_by(*RECIPE_TAGS_ORDERING)
+
+    def ordered_ingredients(self):
+        """Строки состава в порядке RECIPE_INGREDIENTS_ORDERING."""
+        if 'recipe_ingredients' in getattr(
+                self, '_prefetched_objects_cache', {}):
+            return list(self.recipe_ingredients.all())
+        return self.recipe_ingredients.select_related(
+            'ingredient').order_by(*RECIPE_INGREDIENTS_ORDERING)
+
 
 class IngredientRecipe(models.Model):
     """
@@ -146,13 +213,24 @@ class IngredientRecipe(models.Model):
             models.UniqueConstraint(
                 fields=['recipe', 'ingredient'],
                 name='unique_ingredients')]
+        indexes = (
+            models.Index(
+                fields=('recipe', 'ingredient', 'amount'),
+                name='ingredientrecipe_cover_idx',
+            ),
+        )
 
     def __str__(self):
         return f'{self.ingredient} {self.amount}'
 
 
 class BaseFavoriteShopping(models.Model):
-    """Вспомогательная модель для избранного и списка покупок"""
+    """
+    Вспомогательная модель для избранного и списка покупок.
+    В PostgreSQL таблицы секционированы по хешу user_id (миграция
+    0020), поэтому запросы с фильтром по пользователю читают одну
+    секцию, а ограничения уникальности должны включать user.
+    """
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -163,6 +241,11 @@ class BaseFavoriteShopping(models.Model):
         on_delete=models.CASCADE,
         related_name='%(class)s'
     )
+    created = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         abstract = True
@@ -172,6 +255,12 @@ class BaseFavoriteShopping(models.Model):
                 name='unique_%(class)s_recipe'
             )
         ]
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'),
+                name='%(class)s_recipe_user_idx',
+            ),
+        )
 
     def __str__(self):
         return (f'{self.user.username} добавил '
@@ -193,3 +282,200 @@ class ShoppingCart(BaseFavoriteShopping):
     class Meta(BaseFavoriteShopping.Meta):
         verbose_name = 'список покупок'
         verbose_name_plural = 'Список покупок'
+
+
+class RecipeScore(models.Model):
+    """
+    Рейтинг рецепта, пересчитываемый командой update_recipe_scores.
+    popularity - число добавлений в избранное и список покупок,
+    trending - логарифм суммы exp(ln2 * t / период полураспада)
+    по всем добавлениям, где t - время добавления. Порядок рецептов
+    по такой сумме совпадает с порядком по затухающему со временем
+    счёту, поэтому его не нужно пересчитывать с течением времени.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score'
+    )
+    popularity = models.PositiveIntegerField('Популярность', default=0)
+    trending = models.FloatField('Актуальность', default=0)
+    is_stale = models.BooleanField('Требует пересчёта', default=False)
+    updated_at = models.DateTimeField('Дата пересчёта', auto_now=True)
+
+    class Meta:
+        verbose_name = 'рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(
+                fields=('-popularity', '-recipe'),
+                name='recipescore_popularity_idx',
+            ),
+            models.Index(
+                fields=('-trending', '-recipe'),
+                name='recipescore_trending_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.popularity}'
+
+
+class RecipeScoreCursor(models.Model):
+    """
+    Начало последнего успешного запуска update_recipe_scores.
+    Хранится отдельно от рейтингов: их дата пересчёта сдвигается
+    и при создании рецепта.
+    """
+    started_at = models.DateTimeField('Начало пересчёта')
+
+    class Meta:
+        verbose_name = 'отметка пересчёта рейтингов'
+        verbose_name_plural = 'Отметки пересчёта рейтингов'
+
+    def __str__(self):
+        return str(self.started_at)
+
+
+class SimilarRecipe(models.Model):
+    """
+    Похожий рецепт. Списки соседей рассчитываются командой
+    update_similar_recipes по сходству Жаккара наборов ингредиентов
+    и тегов.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='neighbor_of'
+    )
+    score = models.FloatField('Сходство')
+    computed_at = models.DateTimeField('Дата расчёта', auto_now=True)
+
+    class Meta:
+        verbose_name = 'похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similarrecipe_recipe_score_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id} ~ {self.similar_id}: {self.score:.3f}'
+
+
+class SimilarRecipeCursor(models.Model):
+    """
+    Начало последнего успешного запуска update_similar_recipes.
+    Дата расчёта списков для этого не подходит: она сдвигается при
+    каждом пересчёте, в том числе частичном.
+    """
+    started_at = models.DateTimeField('Начало пересчёта')
+
+    class Meta:
+        verbose_name = 'отметка пересчёта похожих рецептов'
+        verbose_name_plural = 'Отметки пересчёта похожих рецептов'
+
+    def __str__(self):
+        return str(self.started_at)
+
+
+class ChangeLog(models.Model):
+    """
+    Журнал изменений для синхронизации клиентов. Записи создаются
+    сигналами в той же транзакции, что и изменение, а id служит
+    курсором синхронизации. Изменения рецептов общие для всех,
+    избранное, список покупок и подписки - только владельца.
+    """
+    RECIPE = 'recipe'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    FOLLOW = 'follow'
+    KINDS = (
+        (RECIPE, 'рецепт'),
+        (FAVORITE, 'избранное'),
+        (SHOPPING_CART, 'список покупок'),
+        (FOLLOW, 'подписка'),
+    )
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (CREATED, 'создание'),
+        (UPDATED, 'изменение'),
+        (DELETED, 'удаление'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='changes'
+    )
+    kind = models.CharField(
+        'Объект', max_length=CHANGELOG_KIND_MAX_LENGTH, choices=KINDS)
+    action = models.CharField(
+        'Действие', max_length=CHANGELOG_KIND_MAX_LENGTH, choices=ACTIONS)
+    object_id = models.BigIntegerField('id объекта')
+    created = models.DateTimeField(
+        'Дата изменения', auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = (
+            models.Index(
+                fields=('user', 'id'),
+                name='changelog_user_id_idx',
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id} {self.action}'
+
+
+class RequestProfile(models.Model):
+    """
+    Профиль запроса, снятый по просьбе сотрудника:
+    статистика cProfile, SQL-запросы с временем и местом вызова.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='request_profiles'
+    )
+    method = models.CharField('Метод', max_length=PROFILE_METHOD_MAX_LENGTH)
+    path = models.TextField('Адрес')
+    status_code = models.PositiveSmallIntegerField('Код ответа')
+    duration = models.FloatField('Время, мс')
+    sql_count = models.PositiveIntegerField('Число SQL-запросов')
+    sql_duration = models.FloatField('Время SQL, мс')
+    stats = models.TextField('Статистика')
+    queries = models.JSONField('SQL-запросы', default=list)
+    profile = models.BinaryField('Профиль cProfile')
+    created = models.DateTimeField(
+        'Дата создания', auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ('-id',)
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration:.0f} мс)'
@@ -0,0 +1,69 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.lookups import IsNull
+from django.utils.functional import cached_property
+
+from .constants import ESTIMATED_COUNT_THRESHOLD
+
+SOFT_DELETE_FIELD = 'deleted_at'
+
+
+def is_soft_delete_filter(where):
+    """Условие менеджера objects мягко удаляемых моделей."""
+    if where.negated or len(where.children) != 1:
+        return False
+    lookup = where.children[0]
+    return (
+        isinstance(lookup, IsNull) and lookup.rhs is True
+        and getattr(lookup.lhs, 'target', None) is not None
+        and lookup.lhs.target.name == SOFT_DELETE_FIELD
+    )
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для админки. Для больших таблиц без фильтров берёт
+    примерное число строк из статистики PostgreSQL вместо COUNT(*).
+    Строки секционированной таблицы суммируются по секциям,
+    для мягко удаляемых моделей число строк умножается на долю
+    NULL в deleted_at.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            estimate = self.get_estimate(queryset, connection)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+    @staticmethod
+    def get_estimate(queryset, connection):
+        where = queryset.query.where
+        soft_delete = bool(where) and is_soft_delete_filter(where)
+        if where and not soft_delete:
+            return None
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT SUM(GREATEST(reltuples, 0)) FROM pg_class '
+                'WHERE oid = %s::regclass OR oid IN ('
+                'SELECT inhrelid FROM pg_inherits '
+                'WHERE inhparent = %s::regclass)',
+                [connection.ops.quote_name(table)] * 2
+            )
+            rows = cursor.fetchone()[0]
+            if rows is None:
+                return None
+            if soft_delete:
+                cursor.execute(
+                    'SELECT null_frac FROM pg_stats '
+                    'WHERE tablename = %s AND attname = %s',
+                    [table, SOFT_DELETE_FIELD]
+                )
+                stats = cursor.fetchone()
+                if stats is not None:
+                    rows *= stats[0]
+        return int(rows)
@@ -0,0 +1,59 @@
+from django.db import models
+
+
+def rebuild_table(schema_editor, model, key=None, partitions=None):
+    """
+    Пересоздаёт таблицу модели в PostgreSQL: секционированной
+    по хешу поля key на partitions секций или, без partitions, обычной.
+    Данные переносятся, последовательность id сохраняется, а индексы,
+    ограничения и внешние ключи создаются заново по описанию модели.
+    Первичный ключ секционированной таблицы включает ключ секций,
+    поэтому ограничения уникальности модели тоже должны его включать.
+    В остальных базах, например SQLite в тестах, ничего не делает.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    table = model._meta.db_table
+    old_table = f'{table}_old'
+    pk = model._meta.pk.column
+    primary_key = [quote(pk)]
+    partition_by = ''
+    if partitions:
+        column = quote(model._meta.get_field(key).column)
+        primary_key.append(column)
+        partition_by = f' PARTITION BY HASH ({column})'
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', (table, pk))
+        sequence = cursor.fetchone()[0]
+    schema_editor.execute(
+        f'ALTER TABLE {quote(table)} RENAME TO {quote(old_table)}')
+    # CHECK-ограничения копирует LIKE, остальные создаются ниже.
+    schema_editor.execute(
+        f'CREATE TABLE {quote(table)} (LIKE {quote(old_table)} '
+        f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partition_by}'
+    )
+    for remainder in range(partitions or 0):
+        schema_editor.execute(
+            f'CREATE TABLE {quote(f"{table}_p{remainder}")} '
+            f'PARTITION OF {quote(table)} '
+            f'FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})'
+        )
+    schema_editor.execute(
+        f'INSERT INTO {quote(table)} SELECT * FROM {quote(old_table)}')
+    schema_editor.execute(
+        f'ALTER SEQUENCE {sequence} OWNED BY {quote(table)}.{quote(pk)}')
+    schema_editor.execute(f'DROP TABLE {quote(old_table)}')
+    schema_editor.execute(
+        f'ALTER TABLE {quote(table)} '
+        f'ADD PRIMARY KEY ({", ".join(primary_key)})'
+    )
+    for field in model._meta.local_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(
+                model, field, '_fk_%(to_table)s_%(to_column)s'))
+    for statement in schema_editor._model_indexes_sql(model):
+        schema_editor.execute(statement)
+    for constraint in model._meta.constraints:
+        if not isinstance(constraint, models.CheckConstraint):
+            schema_editor.add_constraint(model, constraint)
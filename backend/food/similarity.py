@@ -0,0 +1,104 @@
+import numpy as np
+
+from .models import IngredientRecipe, Recipe
+from .utils import iterate_in_chunks
+
+
+def fetch_pairs(queryset):
+    """Загружает пары значений из queryset в массив формы (N, 2)."""
+    return np.fromiter(
+        (value for row in iterate_in_chunks(queryset) for value in row),
+        dtype=np.int64
+    ).reshape(-1, 2)
+
+
+def build_csr(rows, values, size):
+    """
+    Группирует values по номерам строк rows: значения строки i лежат
+    в values[offsets[i]:offsets[i + 1]].
+    """
+    order = np.argsort(rows, kind='stable')
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=offsets[1:])
+    return offsets, values[order]
+
+
+class RecipeFeatures:
+    """
+    Наборы ингредиентов и тегов всех рецептов для расчёта сходства
+    Жаккара. Кандидатами в соседи считаются рецепты хотя бы с одним
+    общим ингредиентом: они находятся по инвертированному индексу,
+    а пересечения считаются векторно.
+    """
+
+    def __init__(self, recipe_ids, ingredient_pairs, tag_pairs):
+        self.recipe_ids = np.unique(recipe_ids)
+        ingredient_pairs = self.known_pairs(ingredient_pairs)
+        tag_pairs = self.known_pairs(tag_pairs)
+        size = len(self.recipe_ids)
+        ingredient_rows = np.searchsorted(
+            self.recipe_ids, ingredient_pairs[:, 0])
+        ingredients = np.unique(
+            ingredient_pairs[:, 1], return_inverse=True)[1]
+        self.recipe_offsets, self.recipe_ingredients = build_csr(
+            ingredient_rows, ingredients, size)
+        self.ingredient_offsets, self.ingredient_recipes = build_csr(
+            ingredients, ingredient_rows.astype(np.int32),
+            ingredients.max(initial=-1) + 1)
+        tag_columns = np.unique(tag_pairs[:, 1], return_inverse=True)[1]
+        self.tags = np.zeros(
+            (size, tag_columns.max(initial=-1) + 1), dtype=np.uint8)
+        self.tags[np.searchsorted(self.recipe_ids, tag_pairs[:, 0]),
+                  tag_columns] = 1
+        self.sizes = np.diff(self.recipe_offsets) + self.tags.sum(axis=1)
+
+    def known_pairs(self, pairs):
+        """
+        Пары загружаются отдельными запросами, поэтому в них могут
+        быть рецепты, созданные после чтения id. Такие пары
+        отбрасываются, рецепты попадут в следующий пересчёт.
+        """
+        return pairs[np.isin(pairs[:, 0], self.recipe_ids)]
+
+    @classmethod
+    def build(cls):
+        return cls(
+            np.fromiter(Recipe.all_objects.values_list('id', flat=True)
+                        .order_by().iterator(), dtype=np.int64),
+            fetch_pairs(IngredientRecipe.objects.values_list(
+                'recipe_id', 'ingredient_id').order_by()),
+            fetch_pairs(Recipe.tags.through.objects.values_list(
+                'recipe_id', 'tag_id').order_by()),
+        )
+
+    def neighbors(self, recipe_id, count):
+        """Возвращает до count пар (id рецепта, сходство) по убыванию."""
+        row = np.searchsorted(self.recipe_ids, recipe_id)
+        if (row >= len(self.recipe_ids)
+                or self.recipe_ids[row] != recipe_id):
+            return []
+        ingredients = self.recipe_ingredients[
+            self.recipe_offsets[row]:self.recipe_offsets[row + 1]]
+        if not len(ingredients):
+            return []
+        postings = np.concatenate([
+            self.ingredient_recipes[
+                self.ingredient_offsets[ingredient]:
+                self.ingredient_offsets[ingredient + 1]]
+            for ingredient in ingredients
+        ])
+        candidates, common = np.unique(postings, return_counts=True)
+        keep = candidates != row
+        candidates, common = candidates[keep], common[keep]
+        common = common + self.tags[candidates] @ self.tags[row]
+        scores = common / (
+            self.sizes[row] + self.sizes[candidates] - common)
+        if len(candidates) > count:
+            top = np.argpartition(-scores, count - 1)[:count]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.lexsort((-candidates[top], -scores[top]))]
+        return list(zip(
+            self.recipe_ids[candidates[top]].tolist(),
+            scores[top].tolist()
+        ))
@@ -0,0 +1,131 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from food.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                         ShoppingCart, Tag)
+from food.pagination import EstimatedCountPaginator, is_soft_delete_filter
+from users.models import Follow
+
+User = get_user_model()
+
+CHANGELIST_URLS = (
+    '/admin/users/user/',
+    '/admin/users/follow/',
+    '/admin/food/recipe/',
+    '/admin/food/ingredientrecipe/',
+    '/admin/food/favorite/',
+    '/admin/food/shoppingcart/',
+)
+
+
+class AdminQueryCountTest(TestCase):
+    """Число запросов страниц админки не зависит от числа строк."""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com', username='admin', first_name='admin',
+            last_name='admin', password='password')
+        self.client.force_login(self.admin)
+        self.tag = Tag.objects.create(name='Тег', slug='tag')
+        self.ingredient = Ingredient.objects.create(
+            name='Ингредиент', measurement_unit='г')
+        self.seeded = 0
+
+    def seed(self, count):
+        for number in range(self.seeded, self.seeded + count):
+            user = User.objects.create_user(
+                email=f'user{number}@example.com', username=f'user{number}',
+                first_name='user', last_name='user', password='password')
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {number}', text='Текст', cooking_time=1,
+                author=user, image='recipes/images/recipe.png')
+            recipe.tags.add(self.tag)
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=self.ingredient, amount=1)
+            Favorite.objects.create(user=self.admin, recipe=recipe)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+            Follow.objects.create(user=self.admin, following=user)
+        self.seeded += count
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_count_is_constant(self):
+        self.seed(3)
+        small = {url: self.count_queries(url) for url in CHANGELIST_URLS}
+        self.seed(20)
+        for url in CHANGELIST_URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), small[url])
+
+    def test_soft_delete_filter_detection(self):
+        self.assertTrue(
+            is_soft_delete_filter(Recipe.objects.all().query.where))
+        self.assertTrue(is_soft_delete_filter(User.objects.all().query.where))
+        self.assertFalse(is_soft_delete_filter(
+            Recipe.objects.filter(name='Рецепт').query.where))
+        self.assertFalse(is_soft_delete_filter(
+            Recipe.all_objects.filter(deleted_at__isnull=False).query.where))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Статистика PostgreSQL')
+class EstimatedCountPaginatorTest(TestCase):
+    """Число строк больших таблиц берётся из статистики без COUNT(*)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(
+            User(email=f'user{number}@example.com',
+                 username=f'user{number}', first_name='user',
+                 last_name='user', password='password')
+            for number in range(50)
+        )
+        recipes = Recipe.objects.bulk_create(
+            Recipe(name=f'Рецепт {number}', text='Текст', cooking_time=1,
+                   author=User.objects.first(),
+                   image='recipes/images/recipe.png')
+            for number in range(50)
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=recipes[0])
+            for user in User.objects.all()
+        )
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            for model in (User, Recipe, Favorite):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def get_count(self, queryset):
+        paginator = EstimatedCountPaginator(queryset, 10)
+        with CaptureQueriesContext(connection) as queries:
+            count = paginator.count
+        return count, any('COUNT(' in query['sql'] for query in queries)
+
+    @mock.patch('food.pagination.ESTIMATED_COUNT_THRESHOLD', 1)
+    def test_soft_delete_querysets_are_estimated(self):
+        for queryset in (User.objects.all(), Recipe.objects.all()):
+            with self.subTest(model=queryset.model):
+                count, counted = self.get_count(queryset)
+                self.assertFalse(counted)
+                self.assertEqual(count, 50)
+
+    @mock.patch('food.pagination.ESTIMATED_COUNT_THRESHOLD', 1)
+    def test_partitioned_table_is_estimated(self):
+        count, counted = self.get_count(Favorite.objects.all())
+        self.assertFalse(counted)
+        self.assertEqual(count, 50)
+
+    @mock.patch('food.pagination.ESTIMATED_COUNT_THRESHOLD', 1)
+    def test_filtered_queryset_is_counted(self):
+        count, counted = self.get_count(
+            Recipe.objects.filter(name='Рецепт 1'))
+        self.assertTrue(counted)
+        self.assertEqual(count, 1)
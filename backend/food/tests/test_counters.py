@@ -0,0 +1,186 @@
+import threading
+from collections import Counter
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from food import counters
+from food.counters import BufferedViewCounter
+from food.models import Recipe
+
+User = get_user_model()
+
+THREADS = 8
+INCREMENTS = 2000
+RECIPE_IDS = (1, 2, 3, 4, 5)
+
+
+def run_threads(target, count=THREADS):
+    threads = [
+        threading.Thread(target=target, args=(number,))
+        for number in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class BufferedViewCounterConcurrencyTest(SimpleTestCase):
+    """Просмотры не теряются и не дублируются при параллельной записи."""
+
+    def setUp(self):
+        self.written = Counter()
+        self.write_lock = threading.Lock()
+        self.writes = 0
+        self.counter = BufferedViewCounter(flush_interval=0.001)
+        self.counter.write = self.write
+        self.addCleanup(self.counter.stop)
+        patcher = mock.patch.object(counters.logger, 'exception')
+        self.log_exception = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, counts):
+        with self.write_lock:
+            self.writes += 1
+            # Каждая третья запись падает, просмотры должны вернуться
+            # в буфер и записаться позже.
+            if self.writes % 3 == 0:
+                raise RuntimeError('write failed')
+            self.written.update(counts)
+
+    def increment(self, number):
+        for step in range(INCREMENTS):
+            self.counter.increment(RECIPE_IDS[(number + step) % 5])
+
+    def flush(self, number):
+        for _ in range(INCREMENTS // 10):
+            try:
+                self.counter.flush()
+            except RuntimeError:
+                pass
+
+    def flush_all(self):
+        while True:
+            try:
+                self.counter.flush()
+                return
+            except RuntimeError:
+                pass
+
+    def test_exact_totals_under_concurrent_increments_and_flushes(self):
+        def work(number):
+            if number % 2:
+                self.flush(number)
+            self.increment(number)
+
+        run_threads(work)
+        self.counter.stop()
+        self.flush_all()
+        self.assertGreater(self.writes, 1)
+        self.assertEqual(
+            sum(self.written.values()), THREADS * INCREMENTS)
+        self.assertEqual(
+            self.written,
+            Counter({
+                recipe_id: THREADS * INCREMENTS // len(RECIPE_IDS)
+                for recipe_id in RECIPE_IDS
+            })
+        )
+
+    def test_background_flush_survives_write_errors(self):
+        for _ in range(10):
+            self.counter.increment(RECIPE_IDS[0])
+            self.counter._stopped.wait(0.01)
+        for _ in range(100):
+            with self.write_lock:
+                if self.written[RECIPE_IDS[0]] == 10:
+                    break
+            self.counter._stopped.wait(0.01)
+        self.counter.stop()
+        self.assertGreaterEqual(self.writes, 3)
+        self.assertTrue(self.log_exception.called)
+        self.assertEqual(self.written, Counter({RECIPE_IDS[0]: 10}))
+
+
+class RecipeViewsMixin:
+
+    def create_recipes(self):
+        user = User.objects.create_user(
+            email='user@example.com', username='user', first_name='user',
+            last_name='user', password='password')
+        return [
+            Recipe.objects.create(
+                name=f'Рецепт {number}', text='Текст', cooking_time=1,
+                author=user, image='recipes/images/recipe.png')
+            for number in range(len(RECIPE_IDS))
+        ]
+
+    def assertViews(self, recipes, total):
+        views = Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).values_list('views', flat=True)
+        self.assertEqual(sorted(views), [total] * len(recipes))
+
+
+class BufferedViewCounterWriteTest(RecipeViewsMixin, TestCase):
+
+    def test_flush_adds_buffered_views(self):
+        recipes = self.create_recipes()
+        counter = BufferedViewCounter(flush_interval=60)
+        self.addCleanup(counter.stop)
+        for _ in range(3):
+            for recipe in recipes:
+                counter.increment(recipe.id, 2)
+            counter.flush()
+        counter.flush()
+        self.assertViews(recipes, 6)
+
+    def test_recipe_edit_between_flushes_keeps_views(self):
+        recipes = self.create_recipes()
+        recipe = Recipe.objects.get(id=recipes[0].id)
+        counter = BufferedViewCounter(flush_interval=60)
+        self.addCleanup(counter.stop)
+        counter.increment(recipe.id, 3)
+        counter.flush()
+        recipe.name = 'Новое название'
+        recipe.save()
+        counter.increment(recipe.id, 2)
+        counter.flush()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.views, 5)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL only')
+class BufferedViewCounterDatabaseConcurrencyTest(
+        RecipeViewsMixin, TransactionTestCase):
+    """
+    Воркеры со своими буферами параллельно пишут просмотры
+    одних и тех же рецептов.
+    """
+
+    def test_exact_totals_from_concurrent_workers(self):
+        recipes = self.create_recipes()
+        errors = []
+
+        def work(number):
+            counter = BufferedViewCounter(flush_interval=0.005)
+            try:
+                for step in range(INCREMENTS // 10):
+                    for recipe in recipes:
+                        counter.increment(recipe.id)
+                    if step % 20 == 0:
+                        counter.flush()
+                counter.stop()
+                counter.flush()
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        run_threads(work)
+        self.assertEqual(errors, [])
+        self.assertViews(recipes, THREADS * INCREMENTS // 10)
@@ -0,0 +1,75 @@
+from datetime import timedelta
+from io import StringIO
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from food.models import (Ingredient, IngredientRecipe, Recipe, SimilarRecipe,
+                         SimilarRecipeCursor)
+from food.similarity import RecipeFeatures
+
+User = get_user_model()
+
+
+class RecipeFeaturesTest(SimpleTestCase):
+
+    def test_pairs_of_unknown_recipes_are_dropped(self):
+        features = RecipeFeatures(
+            np.array([1, 2, 3]),
+            np.array([[1, 10], [2, 10], [4, 11]]),
+            np.array([[1, 5], [4, 6]]),
+        )
+        self.assertEqual(features.neighbors(1, 5), [(2, 0.5)])
+        self.assertEqual(features.neighbors(4, 5), [])
+
+
+class UpdateSimilarRecipesTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', first_name='user',
+            last_name='user', password='password')
+        self.flour = Ingredient.objects.create(
+            name='мука', measurement_unit='г')
+        self.milk = Ingredient.objects.create(
+            name='молоко', measurement_unit='мл')
+
+    def create_recipe(self, ingredient):
+        recipe = Recipe.objects.create(
+            name='Рецепт', text='Текст', cooking_time=1, author=self.user,
+            image='recipes/images/recipe.png')
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1)
+        return recipe
+
+    def get_similar_ids(self, recipe):
+        return list(SimilarRecipe.objects.filter(
+            recipe=recipe).values_list('similar_id', flat=True))
+
+    def test_recipes_changed_after_run_start_are_recomputed(self):
+        recipe = self.create_recipe(self.flour)
+        with_flour = self.create_recipe(self.flour)
+        with_milk = self.create_recipe(self.milk)
+        call_command('update_similar_recipes', stdout=StringIO())
+        self.assertEqual(self.get_similar_ids(recipe), [with_flour.id])
+        # Рецепт изменён во время прошлого запуска, уже после чтения
+        # данных, а списки соседей записаны в конце запуска.
+        now = timezone.now()
+        SimilarRecipeCursor.objects.update(
+            started_at=now - timedelta(minutes=20))
+        Recipe.objects.update(updated_at=now - timedelta(minutes=30))
+        recipe.recipe_ingredients.update(ingredient=self.milk)
+        Recipe.objects.filter(pk=recipe.pk).update(
+            updated_at=now - timedelta(minutes=10))
+        SimilarRecipe.objects.update(computed_at=now)
+        call_command('update_similar_recipes', stdout=StringIO())
+        self.assertEqual(self.get_similar_ids(recipe), [with_milk.id])
+
+    def test_cursor_moves_to_run_start(self):
+        before = timezone.now()
+        call_command('update_similar_recipes', stdout=StringIO())
+        cursor = SimilarRecipeCursor.objects.get()
+        self.assertGreaterEqual(cursor.started_at, before)
@@ -0,0 +1,105 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from food.management.commands.update_recipe_scores import Command
+from food.models import Favorite, Recipe, RecipeScore, RecipeScoreCursor
+
+User = get_user_model()
+
+
+class RecipeScoresMixin:
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com', username='user', first_name='user',
+            last_name='user', password='password')
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            name='Рецепт', text='Текст', cooking_time=1, author=self.user,
+            image='recipes/images/recipe.png')
+
+
+class UpdateRecipeScoresTest(RecipeScoresMixin, TestCase):
+
+    def test_new_recipes_do_not_hide_earlier_favorites(self):
+        recipe = self.create_recipe()
+        call_command('update_recipe_scores', stdout=StringIO())
+        now = timezone.now()
+        RecipeScoreCursor.objects.update(
+            started_at=now - timedelta(minutes=20))
+        favorite = Favorite.objects.create(user=self.user, recipe=recipe)
+        Favorite.objects.filter(pk=favorite.pk).update(
+            created=now - timedelta(minutes=10))
+        self.create_recipe()
+        call_command('update_recipe_scores', stdout=StringIO())
+        self.assertEqual(
+            RecipeScore.objects.get(recipe=recipe).popularity, 1)
+
+    def test_cursor_moves_to_run_start(self):
+        before = timezone.now()
+        call_command('update_recipe_scores', stdout=StringIO())
+        cursor = RecipeScoreCursor.objects.get()
+        self.assertGreaterEqual(cursor.started_at, before)
+
+    def test_scores_are_updated_in_place(self):
+        recipe = self.create_recipe()
+        Favorite.objects.create(user=self.user, recipe=recipe)
+        RecipeScore.objects.filter(recipe=recipe).update(is_stale=True)
+        call_command('update_recipe_scores', '--full', stdout=StringIO())
+        score = RecipeScore.objects.get(recipe=recipe)
+        self.assertEqual(score.popularity, 1)
+        self.assertFalse(score.is_stale)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'PostgreSQL only')
+class UpdateRecipeScoresConcurrencyTest(
+        RecipeScoresMixin, TransactionTestCase):
+
+    def test_deletion_during_update_keeps_stale_flag(self):
+        recipe = self.create_recipe()
+        favorite = Favorite.objects.create(user=self.user, recipe=recipe)
+        scores_read = threading.Event()
+        release = threading.Event()
+        get_scores = Command.get_scores
+
+        def paused_get_scores(command, recipe_ids):
+            scores = get_scores(command, recipe_ids)
+            scores_read.set()
+            release.wait(5)
+            return scores
+
+        def update():
+            try:
+                with mock.patch.object(
+                        Command, 'get_scores', paused_get_scores):
+                    call_command(
+                        'update_recipe_scores', '--full', stdout=StringIO())
+            finally:
+                connection.close()
+
+        def delete():
+            try:
+                favorite.delete()
+            finally:
+                connection.close()
+
+        updater = threading.Thread(target=update)
+        updater.start()
+        self.assertTrue(scores_read.wait(5))
+        deleter = threading.Thread(target=delete)
+        deleter.start()
+        # Удаление ждёт блокировки рейтинга, пока пересчёт не завершён.
+        deleter.join(1)
+        release.set()
+        updater.join()
+        deleter.join()
+        self.assertTrue(RecipeScore.objects.get(recipe=recipe).is_stale)
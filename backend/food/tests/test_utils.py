@@ -0,0 +1,76 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F
+from django.test import TestCase
+
+from food.models import Recipe
+from food.utils import iterate_in_chunks
+
+User = get_user_model()
+
+
+@mock.patch.dict(settings.DATABASES['default'],
+                 DISABLE_SERVER_SIDE_CURSORS=True)
+class IterateInChunksTest(TestCase):
+    """Пачки по первичному ключу при отключённых серверных курсорах."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user', first_name='user',
+            last_name='user', password='password')
+        cls.recipes = [
+            Recipe.objects.create(
+                name=f'Рецепт {number}', text='Текст',
+                cooking_time=number + 1, author=cls.user,
+                image='recipes/images/recipe.png')
+            for number in range(5)
+        ]
+
+    def assertChunked(self, queryset, expected):
+        # 5 строк пачками по 2: три запроса со строками и пустой.
+        with self.assertNumQueries(4):
+            self.assertEqual(
+                list(iterate_in_chunks(queryset, chunk_size=2)), expected)
+
+    def test_models(self):
+        self.assertChunked(Recipe.objects.all(), self.recipes)
+
+    def test_values(self):
+        self.assertChunked(
+            Recipe.objects.values('name').annotate(time=F('cooking_time')),
+            [{'name': recipe.name, 'time': recipe.cooking_time}
+             for recipe in self.recipes]
+        )
+
+    def test_values_list(self):
+        self.assertChunked(
+            Recipe.objects.values_list('name', 'cooking_time'),
+            [(recipe.name, recipe.cooking_time) for recipe in self.recipes]
+        )
+
+    def test_flat_values_list(self):
+        self.assertChunked(
+            Recipe.objects.values_list('id', flat=True),
+            [recipe.id for recipe in self.recipes]
+        )
+
+    def test_named_values_list(self):
+        rows = list(iterate_in_chunks(
+            Recipe.objects.values_list('id', 'name', named=True),
+            chunk_size=2))
+        self.assertEqual(
+            [(row.id, row.name) for row in rows],
+            [(recipe.id, recipe.name) for recipe in self.recipes]
+        )
+
+    def test_aggregated_queryset_is_read_at_once(self):
+        queryset = Recipe.objects.values('author_id').annotate(
+            count=Count('id')).order_by()
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(iterate_in_chunks(queryset, chunk_size=2)),
+                [{'author_id': self.user.id, 'count': 5}]
+            )
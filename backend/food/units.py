@@ -0,0 +1,53 @@
+from django.db.models import Case, CharField, F, FloatField, Value, When
+
+# Единица измерения -> (базовая единица, множитель перевода в неё).
+UNIT_CONVERSIONS = {
+    'мг': ('г', 0.001),
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+}
+
+# Базовая единица -> (крупная единица, множитель), от крупной к мелкой.
+DISPLAY_UNITS = {
+    'г': (('кг', 1000),),
+    'мл': (('л', 1000),),
+}
+
+AMOUNT_PRECISION = 2
+
+
+def canonical_unit(unit_field):
+    """Выражение с базовой единицей измерения для поля unit_field."""
+    return Case(
+        *(When(**{unit_field: unit}, then=Value(base_unit))
+          for unit, (base_unit, _) in UNIT_CONVERSIONS.items()),
+        default=F(unit_field),
+        output_field=CharField(),
+    )
+
+
+def canonical_amount(amount_field, unit_field):
+    """Выражение с количеством, переведённым в базовую единицу."""
+    return F(amount_field) * Case(
+        *(When(**{unit_field: unit}, then=Value(factor))
+          for unit, (_, factor) in UNIT_CONVERSIONS.items()),
+        default=Value(1),
+        output_field=FloatField(),
+    )
+
+
+def format_amount(amount, unit):
+    """
+    Переводит количество в базовой единице в наиболее удобную
+    единицу и округляет его, например 1500 г -> 1.5 кг.
+    """
+    for display_unit, factor in DISPLAY_UNITS.get(unit, ()):
+        if amount >= factor:
+            amount, unit = amount / factor, display_unit
+            break
+    amount = round(amount, AMOUNT_PRECISION)
+    if amount == int(amount):
+        amount = int(amount)
+    return amount, unit
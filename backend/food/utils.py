@@ -0,0 +1,105 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.query import (FlatValuesListIterable, ModelIterable,
+                                    NamedValuesListIterable, ValuesIterable)
+from django.db.models.utils import create_namedtuple_class
+
+from .constants import CHUNK_SIZE
+
+
+def chunked(iterable, size=CHUNK_SIZE):
+    """Разбивает итерируемый объект на списки не длиннее size."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iterate_in_chunks(queryset, chunk_size=CHUNK_SIZE):
+    """
+    Перебирает queryset порциями, не загружая его в память целиком.
+    Обычно используется серверный курсор. Если серверные курсоры
+    отключены (работа через pgbouncer), строки выбираются пачками
+    по первичному ключу и идут в его порядке. Запросы с DISTINCT,
+    группировкой или срезом так не разбиваются и читаются целиком.
+    """
+    db_settings = settings.DATABASES[queryset.db]
+    query = queryset.query
+    if (not db_settings.get('DISABLE_SERVER_SIDE_CURSORS')
+            or query.distinct or query.group_by is not None
+            or query.is_sliced or query.combinator):
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+    if queryset._iterable_class is ModelIterable:
+        rows, convert = queryset, None
+    else:
+        fields = get_row_fields(queryset)
+        rows = queryset.values_list('pk', *fields)
+        convert = get_row_converter(queryset._iterable_class, fields)
+    rows = rows.order_by('pk')
+    last_pk = None
+    while True:
+        batch = rows
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch[:chunk_size])
+        if not batch:
+            return
+        if convert is None:
+            yield from batch
+            last_pk = batch[-1].pk
+        else:
+            yield from map(convert, batch)
+            last_pk = batch[-1][0]
+
+
+def get_row_fields(queryset):
+    """Имена полей строк queryset с values() или values_list()."""
+    query = queryset.query
+    if queryset._fields and queryset._iterable_class is not ValuesIterable:
+        return [
+            *queryset._fields,
+            *(name for name in query.annotation_select
+              if name not in queryset._fields)
+        ]
+    return [*query.extra_select, *query.values_select,
+            *query.annotation_select]
+
+
+def get_row_converter(iterable_class, fields):
+    """
+    Приводит строку (pk, *fields) к виду, который вернул бы
+    queryset с values() или values_list().
+    """
+    if iterable_class is ValuesIterable:
+        return lambda row: dict(zip(fields, row[1:]))
+    if iterable_class is FlatValuesListIterable:
+        return lambda row: row[1]
+    if iterable_class is NamedValuesListIterable:
+        row_class = create_namedtuple_class(*fields)
+        return lambda row: row_class(*row[1:])
+    return lambda row: row[1:]
+
+
+def count_subquery(queryset, field_name):
+    """
+    Коррелированный подзапрос с числом объектов queryset, связанных
+    с текущей строкой внешнего запроса через поле field_name.
+    Считается только для попавших на страницу строк, без GROUP BY
+    по всей таблице.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field_name: OuterRef('pk')})
+            .order_by()
+            .values(field_name)
+            .annotate(count=Count('pk'))
+            .values('count')
+        ),
+        0
+    )
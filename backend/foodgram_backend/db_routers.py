@@ -0,0 +1,79 @@
+import random
+import threading
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+
+PRIMARY_PIN_CACHE_KEY = 'db:primary_pin:{}'
+
+_state = threading.local()
+
+
+def set_read_replica(enabled):
+    """Включает чтение с реплик для текущего потока."""
+    _state.use_replica = enabled
+
+
+def get_pin_cache():
+    return caches[settings.REPLICA_PIN_CACHE_ALIAS]
+
+
+def pin_to_primary(user):
+    """
+    Закрепляет чтение пользователя за основной базой, чтобы он
+    сразу видел свои изменения, пока реплики догоняют основную базу.
+    Отметка хранится в общем кэше: следующий запрос может попасть
+    в другой воркер.
+    """
+    get_pin_cache().set(PRIMARY_PIN_CACHE_KEY.format(user.pk), True,
+                        settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    return (user.is_authenticated
+            and get_pin_cache().get(
+                PRIMARY_PIN_CACHE_KEY.format(user.pk), False))
+
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def check_replica_pin_cache(app_configs, **kwargs):
+    """Закрепление за основной базой не работает в кэше одного процесса."""
+    if not settings.DB_REPLICAS:
+        return []
+    backend = settings.CACHES.get(
+        settings.REPLICA_PIN_CACHE_ALIAS, {}).get('BACKEND')
+    if backend is None or backend in LOCAL_CACHE_BACKENDS:
+        return [checks.Error(
+            'Для чтения с реплик нужен общий для всех воркеров кэш '
+            f'REPLICA_PIN_CACHE_ALIAS, сейчас: {backend}.',
+            hint='Задайте CACHE_LOCATION или REPLICA_PIN_CACHE_ALIAS.',
+            id='foodgram.E001',
+        )]
+    return []
+
+
+class ReplicaRouter:
+    """
+    Направляет чтение на реплики, если оно разрешено для текущего
+    запроса, а запись и миграции - в основную базу.
+    """
+
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'use_replica', False) and settings.DB_REPLICAS:
+            return random.choice(settings.DB_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
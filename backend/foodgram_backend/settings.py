@@ -39,6 +39,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.RateLimitHeadersMiddleware',
+    'api.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram_backend.urls'
@@ -68,10 +70,43 @@ DATABASES = {
         'USER': env('POSTGRES_USER', 'foodgram_user'),
         'PASSWORD': env('POSTGRES_PASSWORD', 'foodgram_password'),
         'HOST': env('DB_HOST', ''),
-        'PORT': env.int('DB_PORT', 5432)
+        'PORT': env.int('DB_PORT', 5432),
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', 60),
+        'DISABLE_SERVER_SIDE_CURSORS': env.bool('DB_PGBOUNCER', False),
     }
 }
 
+CONN_HEALTH_CHECKS = env.bool('DB_CONN_HEALTH_CHECKS', True)
+
+DB_REPLICAS = []
+
+for number, host in enumerate(env.list('DB_REPLICA_HOSTS', []), start=1):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DB_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['foodgram_backend.db_routers.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', 5)
+REPLICA_PIN_CACHE_ALIAS = env('REPLICA_PIN_CACHE_ALIAS', 'default')
+
+if env('CACHE_LOCATION', None):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': env.list('CACHE_LOCATION'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -107,17 +142,44 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+CATALOG_SNAPSHOT_ROOT = env('CATALOG_SNAPSHOT_ROOT', None)
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.AnonReadThrottle',
+        'api.throttling.UserWriteThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon_read': env('THROTTLE_ANON_READ', '120/min'),
+        'user_write': env('THROTTLE_USER_WRITE', '60/min'),
+        'short_link': env('THROTTLE_SHORT_LINK', '60/min'),
+    },
+    'NUM_PROXIES': env.int('NUM_PROXIES', 1),
 }
 
+AUTH_TOKEN_CACHE_ALIAS = env('AUTH_TOKEN_CACHE_ALIAS', None)
+
+SINGLE_FLIGHT_CACHE_ALIAS = env('SINGLE_FLIGHT_CACHE_ALIAS', None)
+
+if env.bool('FAST_JSON', False):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SERIALIZERS': {
@@ -4,30 +4,53 @@ from django.contrib.auth.models import Group
 from rest_framework.authtoken.models import TokenProxy
 
 from .models import Follow, User
+from food.admin import BaseAdmin, ExportCsvMixin, SoftDeleteAdminMixin
+from food.deletion import mark_user_deleted
+from food.models import Recipe
+from food.pagination import EstimatedCountPaginator
+from food.utils import count_subquery
 
 
 @admin.register(User)
-class UserAdmin(UserAdmin):
+class UserAdmin(SoftDeleteAdminMixin, ExportCsvMixin, UserAdmin):
     list_display = ('username', 'email', 'password',
                     'first_name', 'last_name', 'is_staff',
                     'recipes_count', 'followers_count')
     list_filter = ('is_staff', )
     empty_value_display = 'Не заполнено'
-    list_editable = ('is_staff', 'password')
+    list_editable = ('is_staff',)
     search_fields = ('username', 'email')
-
-    @admin.display(description='Количество рецептов')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    mark_deleted = staticmethod(mark_user_deleted)
+    export_fields = ('id', 'username', 'email', 'first_name', 'last_name',
+                     'is_staff', 'is_active', 'date_joined')
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(
+            deleted_at__isnull=True
+        ).annotate(
+            recipes_count=count_subquery(Recipe.objects, 'author'),
+            followers_count=count_subquery(Follow.objects, 'following'),
+        )
+
+    @admin.display(description='Количество рецептов',
+                   ordering='recipes_count')
     def recipes_count(self, request):
-        return request.recipes.all().count()
+        return request.recipes_count
 
-    @admin.display(description='Количество подписчиков')
+    @admin.display(description='Количество подписчиков',
+                   ordering='followers_count')
     def followers_count(self, request):
-        return request.following.count()
+        return request.followers_count
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(ExportCsvMixin, BaseAdmin):
     list_display = ('user', 'following')
+    export_fields = ('id', 'user_id', 'following_id')
+    list_select_related = ('user', 'following')
+    autocomplete_fields = ('user', 'following')
     search_fields = ('user__username', 'following__username')
 
 
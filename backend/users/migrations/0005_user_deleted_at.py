@@ -0,0 +1,31 @@
+# Generated by Django 3.2.16 on 2026-10-19 10:29
+
+import django.contrib.auth.models
+from django.db import migrations, models
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='user',
+            options={'default_manager_name': 'all_objects', 'ordering': ('-id',), 'verbose_name': 'пользователь', 'verbose_name_plural': 'Пользователи'},
+        ),
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', users.models.ActiveUserManager()),
+                ('all_objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Дата удаления'),
+        ),
+    ]
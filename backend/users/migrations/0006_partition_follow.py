@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from food.partitioning import rebuild_table
+
+PARTITIONS = 16
+
+
+def partition_follow(apps, schema_editor):
+    """Секционирует подписки по хешу user_id."""
+    rebuild_table(
+        schema_editor, apps.get_model('users', 'Follow'), 'user', PARTITIONS)
+
+
+def unpartition_follow(apps, schema_editor):
+    rebuild_table(schema_editor, apps.get_model('users', 'Follow'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_deleted_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_follow, unpartition_follow),
+    ]
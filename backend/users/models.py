@@ -1,12 +1,25 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.core import validators
 from django.db import models
 
 from .constants import EMAIL_MAX_LENGTH, NAME_MAX_LENGTH, USERNAME_REGEXP
 
 
+class ActiveUserManager(UserManager):
+    """Пользователи без помеченных на удаление."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class User(AbstractUser):
-    """Модель пользователя"""
+    """
+    Модель пользователя.
+    Удалённый пользователь помечается, деактивируется и скрывается
+    менеджером objects до удаления командой purge_deleted. Менеджер
+    по умолчанию видит всех, чтобы проверки уникальности email
+    и имени пользователя учитывали и помеченных.
+    """
     username = models.CharField(
         'Имя пользователя',
         max_length=NAME_MAX_LENGTH,
@@ -25,6 +38,11 @@ class User(AbstractUser):
     first_name = models.CharField('Имя', max_length=NAME_MAX_LENGTH)
     last_name = models.CharField('Фамилия', max_length=NAME_MAX_LENGTH)
     avatar = models.ImageField(upload_to='users/', null=True, blank=True)
+    deleted_at = models.DateTimeField(
+        'Дата удаления', null=True, blank=True, db_index=True)
+
+    objects = ActiveUserManager()
+    all_objects = UserManager()
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['first_name', 'last_name', 'username', 'password']
@@ -33,13 +51,18 @@ class User(AbstractUser):
         verbose_name = 'пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('-id',)
+        default_manager_name = 'all_objects'
 
     def __str__(self):
         return self.username
 
 
 class Follow(models.Model):
-    """Модель подписок"""
+    """
+    Модель подписок.
+    В PostgreSQL таблица секционирована по хешу user_id (миграция 0006),
+    ограничения уникальности должны включать user.
+    """
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='follows')
     following = models.ForeignKey(
@@ -55,5 +78,11 @@ class Follow(models.Model):
                 check=~models.Q(user=models.F('following'))
             )
         ]
+        indexes = (
+            models.Index(
+                fields=('following', 'user'),
+                name='follow_following_user_idx',
+            ),
+        )
         verbose_name = 'подписка'
         verbose_name_plural = 'Подписки'